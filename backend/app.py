@@ -26,11 +26,19 @@ def create_app():
     
     app.config["UPLOAD_FOLDER"] = config.UPLOADS_DIR
 
+    # Finish any catalog batch a previous process crashed in the middle of
+    from backend.services.local_storage_service import recover_storage
+    recover_storage()
+
     # ── Firebase Init (Auth Only) ─────────────────────────────────────────
     # We still need the app initialized for ID token verification
     from backend.services.firebase_service import init_firebase
     init_firebase()
 
+    # ── Background Job Workers ────────────────────────────────────────────────
+    from backend.services.job_service import start_workers
+    start_workers()
+
     # ── Register Blueprints ───────────────────────────────────────────────────
     from backend.routes.auth_routes import auth_bp
     from backend.routes.admin_routes import admin_bp
@@ -39,6 +47,7 @@ def create_app():
     from backend.routes.pdf_export_routes import export_bp
     from backend.routes.page_routes import page_bp
     from backend.routes.student_routes import student_bp
+    from backend.routes.job_routes import jobs_bp
 
     app.register_blueprint(auth_bp,    url_prefix="/api/auth")
     app.register_blueprint(admin_bp,   url_prefix="/api/admin")
@@ -46,6 +55,7 @@ def create_app():
     app.register_blueprint(notes_bp,   url_prefix="/api/notes")
     app.register_blueprint(export_bp,  url_prefix="/api/export")
     app.register_blueprint(student_bp, url_prefix="/api/student")
+    app.register_blueprint(jobs_bp,    url_prefix="/api/jobs")
     app.register_blueprint(page_bp)
 
     # ── Inject Firebase Config into Templates ──────────────────────────────
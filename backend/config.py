@@ -25,14 +25,74 @@ class Config:
 
     ALLOWED_EXTENSIONS = {"pdf"}
 
+    # Storage backend: "json" (flat files in DATA_DIR) or "sqlite"
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json").lower()
+    SQLITE_PATH = os.getenv("SQLITE_PATH", os.path.join(DATA_DIR, "notenexus.db"))
+    # JSON backend: fold the progress log into student_progress.json past this size
+    PROGRESS_LOG_MAX_BYTES = int(os.getenv("PROGRESS_LOG_MAX_BYTES", 1024 * 1024))
+
     # Firebase (Auth Only)
     FIREBASE_SERVICE_ACCOUNT_PATH = os.getenv("FIREBASE_SERVICE_ACCOUNT_PATH", "serviceAccountKey.json")
+    FIREBASE_PROJECT_ID = os.getenv("FIREBASE_PROJECT_ID", "")
+    # "online": verify with prefetched certs, fall back to the Admin SDK
+    # "offline": only use the certs already in FIREBASE_CERTS_PATH (tests, benchmarks)
+    AUTH_VERIFY_MODE = os.getenv("AUTH_VERIFY_MODE", "online").lower()
+    FIREBASE_CERTS_PATH = os.getenv("FIREBASE_CERTS_PATH", os.path.join(DATA_DIR, "firebase_certs.json"))
+    TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 4096))  # verified tokens kept in memory
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 30))        # seconds a user/role lookup is reused
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 4096))    # user records kept in memory
 
     # Gemini
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
     GEMINI_MODEL = "gemini-2.5-flash"
+    LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")  # gemini | record | replay | fake
+    LLM_RECORD_DIR = os.getenv("LLM_RECORD_DIR", os.path.join(DATA_DIR, "llm_recordings"))
+    LLM_FAKE_LATENCY = float(os.getenv("LLM_FAKE_LATENCY", 0))           # seconds per fake/replayed call
+    LLM_FAKE_ERROR_RATE = float(os.getenv("LLM_FAKE_ERROR_RATE", 0))     # share of calls failing with a 503
+    LLM_FAKE_RATE_LIMIT_RATE = float(os.getenv("LLM_FAKE_RATE_LIMIT_RATE", 0))  # share failing with a 429
+    LLM_FAKE_SEED = int(os.getenv("LLM_FAKE_SEED", 0))
+    GEMINI_RPM = int(os.getenv("GEMINI_RPM", 10))            # requests per minute, shared by all workers
+    GEMINI_TPM = int(os.getenv("GEMINI_TPM", 250000))        # input tokens per minute
+    GEMINI_BURST = int(os.getenv("GEMINI_BURST", 2))         # requests allowed back-to-back before pacing
+    RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH", os.path.join(DATA_DIR, "rate_limit.db"))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 3))  # consecutive failed calls before failing fast
+    CIRCUIT_RESET_SECONDS = int(os.getenv("CIRCUIT_RESET_SECONDS", 60))         # open time before a half-open probe
+    RATE_LIMIT_MAX_WAIT = int(os.getenv("RATE_LIMIT_MAX_WAIT", 120))  # give up waiting for quota after this
+    RATE_LIMIT_BATCH_MAX_WAIT = int(os.getenv("RATE_LIMIT_BATCH_MAX_WAIT", 1800))  # same, for batch-priority work
+    PRIORITY_RESERVE = int(os.getenv("PRIORITY_RESERVE", 1))                 # requests batch work leaves for students
+    PRIORITY_AGING_SECONDS = int(os.getenv("PRIORITY_AGING_SECONDS", 60))    # waiting this long raises a call one class
     CHUNK_SIZE = 3000        # characters per text chunk
-    MAX_CHUNKS = 10          # max chunks to summarise per PDF
+    SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH_SIZE", 8))          # chunks per summarize request (1 = no batching)
+    SUMMARY_BATCH_TOKENS = int(os.getenv("SUMMARY_BATCH_TOKENS", 12000))  # input tokens per batched request
+    SUMMARY_CALL_BUDGET = int(os.getenv("SUMMARY_CALL_BUDGET", 40))    # max summarize calls per unit (all levels)
+    MERGED_NOTES_TOKENS = int(os.getenv("MERGED_NOTES_TOKENS", 8000))  # merged summaries fed to generate_notes
+    REDUCE_INPUT_TOKENS = int(os.getenv("REDUCE_INPUT_TOKENS", 3000))  # summaries grouped per reduce call
+    SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", 4))  # parallel chunk summaries per process
+    NOTES_WAIT_TIMEOUT = int(os.getenv("NOTES_WAIT_TIMEOUT", 90))    # seconds to wait on another worker's generation
+    NOTES_PROMPT_TOKENS = int(os.getenv("NOTES_PROMPT_TOKENS", 1500))  # budget for notes inside quiz/flashcard prompts
+    QUIZ_VARIANTS = int(os.getenv("QUIZ_VARIANTS", 3))            # distinct quizzes kept per unit for rotation
+    FLASHCARD_VARIANTS = int(os.getenv("FLASHCARD_VARIANTS", 1))  # distinct flashcard sets kept per unit
+    NOTES_EVENTS_MAX_SECONDS = int(os.getenv("NOTES_EVENTS_MAX_SECONDS", 100))  # SSE stream length before client reconnects
+    STREAM_TICKETS_PATH = os.getenv("STREAM_TICKETS_PATH", os.path.join(DATA_DIR, "stream_tickets.db"))
+    STREAM_TICKET_TTL = int(os.getenv("STREAM_TICKET_TTL", 30))  # seconds to open an SSE stream with its ticket
+    SUMMARY_CACHE_PATH = os.getenv("SUMMARY_CACHE_PATH", os.path.join(DATA_DIR, "summary_cache.db"))
+    SUMMARY_CACHE_MAX_BYTES = int(os.getenv("SUMMARY_CACHE_MAX_BYTES", 50 * 1024 * 1024))
+    TOPIC_CACHE_PATH = os.getenv("TOPIC_CACHE_PATH", os.path.join(DATA_DIR, "topic_cache.db"))
+    TOPIC_CACHE_TTL = int(os.getenv("TOPIC_CACHE_TTL", 30 * 24 * 3600))
+    TOPIC_CACHE_MAX_ENTRIES = int(os.getenv("TOPIC_CACHE_MAX_ENTRIES", 2000))
+    TOPIC_SIMILARITY = float(os.getenv("TOPIC_SIMILARITY", 1.0))  # 1.0 = exact normalized match only
+
+    # Background jobs (SQLite queue shared by all workers)
+    JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(DATA_DIR, "jobs.db"))
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", 1))              # worker threads per process
+    JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 1.0))
+    JOB_TIMEOUT = int(os.getenv("JOB_TIMEOUT", 900))            # running longer than this = worker died
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 2))
+    JOB_RETENTION = int(os.getenv("JOB_RETENTION", 24 * 3600))  # keep finished jobs this long
+
+    # Cache warmer (python -m backend.warm)
+    WARM_WORKERS = int(os.getenv("WARM_WORKERS", 2))  # units warmed in parallel
+    WARM_STATE_PATH = os.getenv("WARM_STATE_PATH", os.path.join(DATA_DIR, "warm_state.json"))
 
 
 config = Config()
@@ -2,10 +2,11 @@
 NoteNexus — Admin Routes
 Requires Firebase ID token with admin role.
 """
-from flask import Blueprint, request, jsonify
-from firebase_admin import auth as firebase_auth
+from flask import Blueprint, request, jsonify, Response
+from backend.services.catalog_service import get_catalog
+from backend.routes.auth_middleware import require_admin
 from backend.services.local_storage_service import (
-    get_user, create_semester, get_semesters, delete_semester,
+    create_semester, get_semesters, delete_semester,
     create_subject, get_subjects, delete_subject,
     create_unit, get_units, delete_unit
 )
@@ -13,31 +14,28 @@ from backend.services.local_storage_service import (
 admin_bp = Blueprint("admin", __name__)
 
 
-def require_admin(req):
-    """Middleware: verify token and check admin role."""
-    header = req.headers.get("Authorization", "")
-    if not header.startswith("Bearer "):
-        return None, jsonify({"error": "Unauthorized"}), 401
-    token = header[7:]
-    try:
-        decoded = firebase_auth.verify_id_token(token)
-    except Exception:
-        return None, jsonify({"error": "Invalid token"}), 401
+# ─── Catalog ──────────────────────────────────────────────────────────────────
 
-    user = get_user(decoded["uid"])
-    if not user or user.get("role") != "admin":
-        return None, jsonify({"error": "Admin access required"}), 403
-
-    return decoded, None, None
+@admin_bp.route("/catalog", methods=["GET"])
+def catalog():
+    """
+    Public — full semester → subject → unit tree in one response.
+    ?notes=1 adds a hasNotes flag to every unit. Supports If-None-Match.
+    """
+    include_notes = request.args.get("notes") in ("1", "true")
+    body, etag = get_catalog(include_notes)
+    resp = Response(body, mimetype="application/json")
+    resp.set_etag(etag)
+    # Let browsers keep the body but revalidate every time (cheap 304s).
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp.make_conditional(request)
 
 
 # ─── Semesters ────────────────────────────────────────────────────────────────
 
 @admin_bp.route("/semesters", methods=["POST"])
+@require_admin
 def create_sem():
-    decoded, err, code = require_admin(request)
-    if err:
-        return err, code
     data = request.get_json() or {}
     name = data.get("name", "").strip()
     order = int(data.get("order", 1))
@@ -55,10 +53,8 @@ def list_semesters():
 
 
 @admin_bp.route("/semesters/<semester_id>", methods=["DELETE"])
+@require_admin
 def delete_sem(semester_id):
-    decoded, err, code = require_admin(request)
-    if err:
-        return err, code
     delete_semester(semester_id)
     return jsonify({"status": "ok", "message": "Semester and all its subjects/units deleted"}), 200
 
@@ -66,10 +62,8 @@ def delete_sem(semester_id):
 # ─── Subjects ─────────────────────────────────────────────────────────────────
 
 @admin_bp.route("/subjects", methods=["POST"])
+@require_admin
 def create_subj():
-    decoded, err, code = require_admin(request)
-    if err:
-        return err, code
     data = request.get_json() or {}
     semester_id = data.get("semesterId", "").strip()
     name = data.get("name", "").strip()
@@ -87,10 +81,8 @@ def list_subjects(semester_id):
 
 
 @admin_bp.route("/subjects/<subject_id>", methods=["DELETE"])
+@require_admin
 def delete_subj(subject_id):
-    decoded, err, code = require_admin(request)
-    if err:
-        return err, code
     delete_subject(subject_id)
     return jsonify({"status": "ok", "message": "Subject and related units deleted"}), 200
 
@@ -98,10 +90,8 @@ def delete_subj(subject_id):
 # ─── Units ───────────────────────────────────────────────────────────────────
 
 @admin_bp.route("/units", methods=["POST"])
+@require_admin
 def create_u():
-    decoded, err, code = require_admin(request)
-    if err:
-        return err, code
     data = request.get_json() or {}
     subject_id = data.get("subjectId", "").strip()
     unit_number = int(data.get("unitNumber", 1))
@@ -119,19 +109,15 @@ def list_units(subject_id):
 
 
 @admin_bp.route("/units/<unit_id>", methods=["DELETE"])
+@require_admin
 def delete_u(unit_id):
-    decoded, err, code = require_admin(request)
-    if err:
-        return err, code
     delete_unit(unit_id)
     return jsonify({"status": "ok", "message": "Unit deleted"}), 200
 
 
 @admin_bp.route("/import-syllabus", methods=["POST"])
+@require_admin
 def import_syllabus():
-    decoded, err, code = require_admin(request)
-    if err:
-        return err, code
 
     # Predefined syllabus data
     syllabus = {
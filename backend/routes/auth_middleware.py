@@ -0,0 +1,130 @@
+"""
+NoteNexus — Auth Middleware
+Shared decorators for protected routes:
+  @require_token — valid Firebase ID token (user record may not exist yet)
+  @require_user  — valid token + known user
+  @require_admin — valid token + user with the admin role
+  @require_stream_ticket — as @require_user, for EventSource streams that
+                           pass a single-use ?ticket= instead of a header
+The token is verified and the user looked up at most once per request; the
+results are kept on flask.g as g.decoded and g.user.
+"""
+import time
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import g, request, jsonify
+from backend.config import config
+from backend.services.firebase_service import verify_id_token
+from backend.services.local_storage_service import get_user
+from backend.services.stream_ticket_service import redeem_ticket
+
+# uid -> (user, expires_at). Keeps admin checks from hitting storage on every
+# call; other workers see role changes within USER_CACHE_TTL seconds. Least
+# recently used entries go first once USER_CACHE_SIZE is reached.
+_user_cache = OrderedDict()
+_user_cache_lock = threading.Lock()
+
+
+def get_cached_user(uid: str) -> dict | None:
+    now = time.monotonic()
+    with _user_cache_lock:
+        hit = _user_cache.get(uid)
+        if hit is not None:
+            if hit[1] > now:
+                _user_cache.move_to_end(uid)
+                return dict(hit[0])
+            del _user_cache[uid]
+    user = get_user(uid)
+    if user:
+        with _user_cache_lock:
+            _user_cache[uid] = (user, now + config.USER_CACHE_TTL)
+            _user_cache.move_to_end(uid)
+            while len(_user_cache) > config.USER_CACHE_SIZE:
+                _user_cache.popitem(last=False)
+    return user
+
+
+def invalidate_user(uid: str):
+    """Drop a cached user after its record (e.g. role) changes."""
+    with _user_cache_lock:
+        _user_cache.pop(uid, None)
+
+
+def _bearer_token() -> str | None:
+    header = request.headers.get("Authorization", "")
+    if header.startswith("Bearer "):
+        return header[7:]
+    return None
+
+
+def current_decoded() -> dict | None:
+    """Decoded ID token for this request, or None."""
+    if "decoded" not in g:
+        g.decoded = None
+        token = _bearer_token()
+        if token:
+            try:
+                g.decoded = verify_id_token(token)
+            except Exception as e:
+                print(f"[Auth] Token verification failed: {e}")
+    return g.decoded
+
+
+def current_user() -> dict | None:
+    """User record for this request's token, or None."""
+    if "user" not in g:
+        decoded = current_decoded()
+        g.user = get_cached_user(decoded["uid"]) if decoded else None
+    return g.user
+
+
+def require_token(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not _bearer_token():
+            return jsonify({"error": "Missing or invalid Authorization header"}), 401
+        if not current_decoded():
+            return jsonify({"error": "Invalid token"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def require_user(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user():
+            return jsonify({"error": "Authentication required"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def require_stream_ticket(scope):
+    """
+    Like @require_user, but also accepts ?ticket= issued for scope(**view_args).
+    EventSource can't set headers, and an ID token in the URL would end up in
+    access logs.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not _bearer_token():
+                uid = redeem_ticket(request.args.get("ticket", ""), scope(**kwargs))
+                g.decoded = {"uid": uid} if uid else None
+            if not current_user():
+                return jsonify({"error": "Authentication required"}), 401
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def require_admin(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_decoded():
+            return jsonify({"error": "Unauthorized"}), 401
+        user = current_user()
+        if not user or user.get("role") != "admin":
+            return jsonify({"error": "Admin access required"}), 403
+        return view(*args, **kwargs)
+    return wrapper
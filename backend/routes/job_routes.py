@@ -0,0 +1,40 @@
+"""
+NoteNexus — Job Routes
+GET /api/jobs/<job_id>        — Status of a background generation job
+GET /api/jobs/<job_id>/result — The job's result once finished (202 until then)
+A job is visible only to the users who queued or joined it, and to admins.
+"""
+from flask import Blueprint, g, jsonify
+from backend.services.job_service import get_job, get_job_for
+from backend.routes.auth_middleware import require_user, current_user
+
+jobs_bp = Blueprint("jobs", __name__)
+
+
+def _visible_job(job_id: str) -> dict | None:
+    """The job if the caller queued or joined it (admins see every job)."""
+    if current_user().get("role") == "admin":
+        return get_job(job_id)
+    return get_job_for(job_id, g.decoded["uid"])
+
+
+@jobs_bp.route("/<job_id>", methods=["GET"])
+@require_user
+def job_status(job_id: str):
+    job = _visible_job(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify({"job": job})
+
+
+@jobs_bp.route("/<job_id>/result", methods=["GET"])
+@require_user
+def job_result(job_id: str):
+    job = _visible_job(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    if job["status"] in ("queued", "running"):
+        return jsonify({"status": job["status"], "jobId": job_id}), 202, {"Retry-After": "3"}
+    if "result" in job:
+        return jsonify(job["result"]), 200 if job["status"] == "done" else 400
+    return jsonify({"status": "error", "message": job.get("error", "Job failed")}), 500
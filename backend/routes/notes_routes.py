@@ -1,99 +1,203 @@
 """
 NoteNexus — Notes Routes
-GET  /api/notes/<unit_id>        — Lazy generate or return cached notes
-POST /api/notes/regenerate       — Force regenerate (admin only)
+GET  /api/notes/<unit_id>        — Return cached notes, or queue generation (202 + job id)
+POST /api/notes/regenerate       — Force regenerate (admin only, queued)
 GET  /api/notes/status/<unit_id> — Quick check: do notes exist?
+POST /api/notes/<unit_id>/events/ticket — Single-use ticket for opening the events stream
+GET  /api/notes/<unit_id>/events?ticket= — Server-Sent Events stream of generation progress
+POST /api/notes/generate-topic/stream — Topic notes streamed section by section (NDJSON)
+Generation runs on the background job queue; poll /api/jobs/<job_id> for the result.
 """
-from flask import Blueprint, request, jsonify
-from firebase_admin import auth as firebase_auth
-from backend.services.local_storage_service import get_user, get_generated_notes
+import json
+import time
+from flask import Blueprint, Response, g, request, jsonify, stream_with_context
+from backend.config import config
+from backend.services.local_storage_service import get_generated_notes
+from backend.services.job_service import enqueue, get_job
 from backend.services.notes_service import (
-    get_or_generate_notes, force_regenerate_notes, 
-    generate_topic_notes, generate_unit_quiz, generate_unit_flashcards
+    get_progress, stream_topic_notes, get_cached_quiz, get_cached_flashcards, get_stale_notes
 )
+from backend.services.gemini_service import circuit_open
+from backend.services.rate_limit_service import priority, INTERACTIVE
+from backend.services.topic_cache_service import get_topic_notes, normalize_topic
+from backend.services.stream_ticket_service import issue_ticket
+from backend.routes.auth_middleware import require_user, require_admin, require_stream_ticket
 
 notes_bp = Blueprint("notes", __name__)
 
+
+def _accepted(job: dict):
+    """202 response pointing the client at the queued job."""
+    return jsonify({
+        "status": job["status"],
+        "jobId": job["id"],
+        "statusUrl": f"/api/jobs/{job['id']}",
+    }), 202, {"Retry-After": "3"}
+
+
 @notes_bp.route("/flashcards/<unit_id>", methods=["GET"])
+@require_user
 def get_flashcards(unit_id: str):
-    """Generate revision flashcards for a specific unit."""
-    user = _get_user_from_req(request)
-    if not user:
-        return jsonify({"error": "Authentication required"}), 401
-    
-    result = generate_unit_flashcards(unit_id)
-    if result.get("status") == "error":
-        return jsonify(result), 400
-        
-    return jsonify(result)
+    """Revision flashcards for a unit: stored set if available, else queue generation."""
+    cached = get_cached_flashcards(unit_id)
+    if cached:
+        if cached.pop("refill", False):
+            enqueue("flashcards", {"unitId": unit_id, "background": True}, f"flashcards:{unit_id}", uid=g.decoded["uid"])
+        return jsonify(cached)
+    return _accepted(enqueue("flashcards", {"unitId": unit_id}, f"flashcards:{unit_id}", uid=g.decoded["uid"]))
 
 @notes_bp.route("/quiz/<unit_id>", methods=["GET"])
+@require_user
 def get_quiz(unit_id: str):
-    """Generate a quiz for a specific unit."""
-    user = _get_user_from_req(request)
-    if not user:
-        return jsonify({"error": "Authentication required"}), 401
-    
-    result = generate_unit_quiz(unit_id)
-    if result.get("status") == "error":
-        return jsonify(result), 400
-        
-    return jsonify(result)
-
-def _get_user_from_req(req):
-    header = req.headers.get("Authorization", "")
-    if not header.startswith("Bearer "):
-        return None
-    try:
-        decoded = firebase_auth.verify_id_token(header[7:])
-        return get_user(decoded["uid"])
-    except Exception:
-        return None
+    """Quiz for a unit: a stored quiz if available, else queue generation."""
+    cached = get_cached_quiz(unit_id)
+    if cached:
+        if cached.pop("refill", False):
+            # Top the rotation pool up without making this student wait.
+            enqueue("quiz", {"unitId": unit_id, "background": True}, f"quiz:{unit_id}", uid=g.decoded["uid"])
+        return jsonify(cached)
+    return _accepted(enqueue("quiz", {"unitId": unit_id}, f"quiz:{unit_id}", uid=g.decoded["uid"]))
 
 @notes_bp.route("/generate-topic", methods=["POST"])
+@require_user
 def generate_from_topic():
     """Generate notes from a user-provided topic."""
-    user = _get_user_from_req(request)
-    if not user:
-        return jsonify({"error": "Authentication required"}), 401
+    data = request.get_json() or {}
+    topic = data.get("topic", "").strip()
+    if not topic:
+        return jsonify({"error": "topic is required"}), 400
+
+    cached = get_topic_notes(topic)
+    if cached:
+        return jsonify({"status": "cached", "notes": cached, "topic": topic})
 
+    return _accepted(enqueue("topic", {"topic": topic}, f"topic:{normalize_topic(topic) or topic.lower()}",
+                             uid=g.decoded["uid"]))
+
+
+@notes_bp.route("/generate-topic/stream", methods=["POST"])
+@require_user
+def stream_from_topic():
+    """
+    Generate topic notes, streaming each section as one JSON line as soon as
+    Gemini finishes it. The last line carries the status and the full notes.
+    """
     data = request.get_json() or {}
     topic = data.get("topic", "").strip()
     if not topic:
         return jsonify({"error": "topic is required"}), 400
 
-    result = generate_topic_notes(topic)
-    if result.get("status") == "error":
-        return jsonify(result), 500
+    def lines():
+        with priority(INTERACTIVE):
+            for event in stream_topic_notes(topic):
+                yield json.dumps(event) + "\n"
 
-    return jsonify(result)
+    return Response(
+        stream_with_context(lines()),
+        mimetype="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @notes_bp.route("/<unit_id>", methods=["GET"])
+@require_user
 def get_notes(unit_id: str):
     """
     Lazy generation endpoint.
-    Returns cached notes instantly, or generates + caches them (may take 30-60s).
+    Returns cached notes instantly, or queues generation (may take 30-60s).
+    While Gemini is down (or with ?stale=1) the unit's previous notes are
+    returned instead, flagged "stale".
     """
-    user = _get_user_from_req(request)
-    if not user:
-        return jsonify({"error": "Authentication required"}), 401
+    cached = get_generated_notes(unit_id)
+    if cached:
+        return jsonify({"status": "cached", "notes": cached})
+
+    stale = get_stale_notes(unit_id)
+    if stale and (request.args.get("stale") or circuit_open()):
+        return jsonify({"status": "stale", "stale": True, "notes": stale})
+
+    return _accepted(enqueue("notes", {"unitId": unit_id}, f"notes:{unit_id}", uid=g.decoded["uid"]))
+
+
+def _events_scope(unit_id: str) -> str:
+    return f"notes-events:{unit_id}"
 
-    result = get_or_generate_notes(unit_id)
 
-    if result.get("status") == "error":
-        return jsonify(result), 404
+@notes_bp.route("/<unit_id>/events/ticket", methods=["POST"])
+@require_user
+def notes_events_ticket(unit_id: str):
+    """Ticket for one connection to the events stream (EventSource can't send the token)."""
+    return jsonify({"ticket": issue_ticket(g.decoded["uid"], _events_scope(unit_id))})
 
-    return jsonify(result)
+
+@notes_bp.route("/<unit_id>/events", methods=["GET"])
+@require_stream_ticket(_events_scope)
+def notes_events(unit_id: str):
+    """
+    SSE stream of generation progress for a unit. Starts the generation job,
+    or joins the one already running, so a reconnecting client resumes from
+    the current stage instead of triggering a new run.
+    """
+    job = None
+    if not get_generated_notes(unit_id):
+        job = enqueue("notes", {"unitId": unit_id}, f"notes:{unit_id}", uid=g.decoded["uid"])
+
+    return Response(
+        stream_with_context(_progress_events(unit_id, job)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _sse(event: dict) -> str:
+    return f"id: {event.get('seq', 0)}\nevent: {event['stage']}\ndata: {json.dumps(event)}\n\n"
+
+
+def _progress_events(unit_id: str, job: dict | None):
+    yield "retry: 3000\n\n"
+    if job is None:
+        yield _sse({"unitId": unit_id, "stage": "saved"})
+        return
+
+    deadline = time.monotonic() + config.NOTES_EVENTS_MAX_SECONDS
+    last, last_sent = None, time.monotonic()
+    while time.monotonic() < deadline:
+        event = get_progress(unit_id)
+        # Progress left over from an earlier run doesn't describe this job.
+        if event and event["updatedAt"] < job["createdAt"]:
+            event = None
+        if event is None:
+            current = get_job(job["id"]) or {}
+            result = current.get("result") or {}
+            if current.get("status") == "failed":
+                event = {"unitId": unit_id, "stage": "error",
+                         "message": current.get("error") or "Generation failed"}
+            elif current.get("status") == "done" and result.get("stale"):
+                # Answered from a recent failure with the preserved notes
+                event = {"unitId": unit_id, "stage": "error", "stale": True,
+                         "message": result.get("message") or "Generation failed"}
+            elif current.get("status") == "done":
+                # Finished without reporting progress (e.g. found cached notes)
+                event = {"unitId": unit_id, "stage": "saved"}
+            else:
+                event = {"unitId": unit_id, "stage": "queued"}
+
+        if event != last:
+            yield _sse(event)
+            last, last_sent = event, time.monotonic()
+            if event["stage"] in ("saved", "error"):
+                return
+        elif time.monotonic() - last_sent > 15:
+            yield ": keepalive\n\n"
+            last_sent = time.monotonic()
+        time.sleep(0.5)
+    # Stream ends here; EventSource reconnects and picks up the current stage.
 
 
 @notes_bp.route("/status/<unit_id>", methods=["GET"])
+@require_user
 def notes_status(unit_id: str):
     """Quick check — returns whether notes are already cached (no AI call)."""
-    user = _get_user_from_req(request)
-    if not user:
-        return jsonify({"error": "Authentication required"}), 401
-
     cached = get_generated_notes(unit_id)
     return jsonify({
         "unitId": unit_id,
@@ -103,19 +207,12 @@ def notes_status(unit_id: str):
 
 
 @notes_bp.route("/regenerate", methods=["POST"])
+@require_admin
 def regenerate():
     """Admin only — force-delete cached notes and regenerate."""
-    user = _get_user_from_req(request)
-    if not user or user.get("role") != "admin":
-        return jsonify({"error": "Admin access required"}), 403
-
     data = request.get_json() or {}
     unit_id = data.get("unitId", "").strip()
     if not unit_id:
         return jsonify({"error": "unitId is required"}), 400
 
-    result = force_regenerate_notes(unit_id)
-    if result.get("status") == "error":
-        return jsonify(result), 404
-
-    return jsonify(result)
+    return _accepted(enqueue("regenerate", {"unitId": unit_id}, f"regenerate:{unit_id}", uid=g.decoded["uid"]))
@@ -5,8 +5,7 @@ Generated on-demand, never stored.
 """
 import io
 from flask import Blueprint, request, jsonify, send_file
-from firebase_admin import auth as firebase_auth
-from backend.services.local_storage_service import get_user
+from backend.routes.auth_middleware import require_user
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm
@@ -152,20 +151,9 @@ def build_pdf(notes: dict, unit_title: str) -> bytes:
 
 
 @export_bp.route("/pdf", methods=["POST"])
+@require_user
 def export_pdf():
     """Generate and return a PDF download from notes JSON."""
-    header = request.headers.get("Authorization", "")
-    if not header.startswith("Bearer "):
-        return jsonify({"error": "Authentication required"}), 401
-    try:
-        from firebase_admin import auth as fb_auth
-        decoded = fb_auth.verify_id_token(header[7:])
-        user = get_user(decoded["uid"])
-        if not user:
-            return jsonify({"error": "User not found"}), 401
-    except Exception:
-        return jsonify({"error": "Invalid token"}), 401
-
     data = request.get_json() or {}
     notes = data.get("notes", {})
     unit_title = data.get("unitTitle", "BCA Notes")
@@ -4,11 +4,10 @@ POST /api/upload/pdf — Upload a PDF to Firebase Storage + save metadata
 """
 import os
 import uuid
-from flask import Blueprint, request, jsonify, current_app
-from firebase_admin import auth as firebase_auth
-from backend.services.local_storage_service import (
-    get_user, save_pdf_metadata, delete_generated_notes
-)
+from flask import Blueprint, request, jsonify, current_app, g
+from backend.services.local_storage_service import save_pdf_metadata
+from backend.services.notes_service import invalidate_notes
+from backend.routes.auth_middleware import require_token
 
 upload_bp = Blueprint("upload", __name__)
 
@@ -17,29 +16,14 @@ ALLOWED_EXTENSIONS = {"pdf"}
 def allowed_file(filename: str) -> bool:
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def get_current_user(req):
-    """Return decoded token and user dict, or (None, None) on failure."""
-    header = req.headers.get("Authorization", "")
-    if not header.startswith("Bearer "):
-        return None, None
-    try:
-        decoded = firebase_auth.verify_id_token(header[7:])
-        user = get_user(decoded["uid"])
-        return decoded, user
-    except Exception:
-        return None, None
-
 @upload_bp.route("/pdf", methods=["POST"])
+@require_token
 def upload_pdf():
     """
     Accepts: multipart/form-data with fields:
       - file  (PDF, required)
       - unitId (required)
     """
-    decoded, user = get_current_user(request)
-    if not decoded:
-        return jsonify({"error": "Authentication required"}), 401
-
     unit_id = request.form.get("unitId", "").strip()
     if not unit_id:
         return jsonify({"error": "unitId is required"}), 400
@@ -77,11 +61,11 @@ def upload_pdf():
             unit_id=unit_id,
             local_path=local_path, # Path on local disk
             filename=file.filename,
-            uploaded_by=decoded["uid"]
+            uploaded_by=g.decoded["uid"]
         )
 
         # ── Invalidate cached notes (so they regenerate with new content) ──────
-        delete_generated_notes(unit_id)
+        invalidate_notes(unit_id)
 
         return jsonify({"status": "ok", "pdf": meta}), 201
 
@@ -0,0 +1,46 @@
+"""
+NoteNexus — Catalog Service
+Builds the semester → subject → unit tree served by /api/admin/catalog.
+The tree is rebuilt only when storage reports a new catalog version, and
+each build carries a strong ETag so clients can revalidate with a 304.
+"""
+import json
+import hashlib
+import threading
+from backend.services import local_storage_service as storage
+
+_cache = {}  # include_notes -> {"version", "body", "etag"}
+_lock = threading.Lock()
+
+
+def _build_tree(include_notes: bool) -> dict:
+    units_with_notes = storage.get_units_with_notes() if include_notes else set()
+    semesters = []
+    for sem in storage.get_semesters():
+        subjects = []
+        for subj in storage.get_subjects(sem["id"]):
+            units = []
+            for unit in storage.get_units(subj["id"]):
+                if include_notes:
+                    unit["hasNotes"] = unit["id"] in units_with_notes
+                units.append(unit)
+            subjects.append({**subj, "units": units})
+        semesters.append({**sem, "subjects": subjects})
+    return {"semesters": semesters}
+
+
+def get_catalog(include_notes: bool = False) -> tuple[bytes, str]:
+    """Return (JSON body, ETag) for the full catalog tree."""
+    version = storage.get_catalog_version(include_notes)
+    entry = _cache.get(include_notes)
+    if entry and entry["version"] == version:
+        return entry["body"], entry["etag"]
+
+    with _lock:
+        entry = _cache.get(include_notes)
+        if entry and entry["version"] == version:
+            return entry["body"], entry["etag"]
+        body = json.dumps(_build_tree(include_notes), separators=(",", ":")).encode("utf-8")
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        _cache[include_notes] = {"version": version, "body": body, "etag": etag}
+        return body, etag
@@ -1,29 +1,187 @@
 """
 NoteNexus — Firebase Service (Auth Only)
 Wraps Firebase Admin SDK for Authentication verification.
+
+ID tokens are verified once and then memoized (keyed by a hash of the token)
+until their own `exp` claim. Google's signing certs are prefetched in the
+background and kept in a local file, so verification usually needs neither a
+network round trip nor a call into the Admin SDK. With AUTH_VERIFY_MODE=offline
+only that local file is used, which lets tests and benchmarks run without
+network access. Local verification needs the project id: FIREBASE_PROJECT_ID,
+or else the service account's project_id.
 """
 import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+import requests
 import firebase_admin
-from firebase_admin import credentials
+from firebase_admin import credentials, auth as firebase_auth
+from google.auth import jwt
 from backend.config import config
 
 _firebase_app = None
+_project_id = config.FIREBASE_PROJECT_ID  # else taken from the service account in init_firebase()
 
-def init_firebase():
-    """Initialize Firebase Admin SDK (called once at app startup)."""
-    global _firebase_app
-    if _firebase_app is not None:
-        return  # Already initialized
+CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+ISSUER_PREFIX = "https://securetoken.google.com/"
 
+def init_firebase():
+    """
+    Initialize Firebase Admin SDK (called once at app startup). Raises if
+    AUTH_VERIFY_MODE=offline and no project id is known, since no token
+    could ever be verified.
+    """
+    global _firebase_app, _project_id
+    cred = None
     sa_path = config.FIREBASE_SERVICE_ACCOUNT_PATH
     if not os.path.exists(sa_path):
         print(f"[WARNING] Firebase service account not found at: {sa_path}")
         print("[WARNING] Firebase Authentication will fail. Add serviceAccountKey.json to enable.")
-        return
+    else:
+        try:
+            cred = credentials.Certificate(sa_path)
+        except Exception as e:
+            print(f"[Firebase Auth] ✗ Could not load service account: {e}")
+
+    _project_id = config.FIREBASE_PROJECT_ID or (cred.project_id if cred else "") or ""
+    if not _project_id:
+        if config.AUTH_VERIFY_MODE == "offline":
+            raise RuntimeError("AUTH_VERIFY_MODE=offline needs FIREBASE_PROJECT_ID or a service "
+                               "account with a project_id to verify tokens against.")
+        print("[WARNING] No Firebase project id; every token will be verified by the Admin SDK.")
+    elif config.AUTH_VERIFY_MODE != "offline":
+        start_cert_refresher()
+
+    if _firebase_app is not None or cred is None:
+        return  # Already initialized, or nothing to initialize with
 
     try:
-        cred = credentials.Certificate(sa_path)
         _firebase_app = firebase_admin.initialize_app(cred)
         print("[Firebase Auth] ✓ Initialized successfully.")
     except Exception as e:
         print(f"[Firebase Auth] ✗ Initialization failed: {e}")
+
+
+# ── Token cache ──────────────────────────────────────────────────────────────
+_token_cache = OrderedDict()  # sha256(token) -> (decoded claims, exp)
+_token_cache_lock = threading.Lock()
+
+def verify_id_token(token: str) -> dict:
+    """
+    Verify a Firebase ID token and return its decoded claims (with "uid").
+    Raises on an invalid or expired token, like firebase_admin.auth.verify_id_token.
+    """
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    now = time.time()
+    with _token_cache_lock:
+        hit = _token_cache.get(key)
+        if hit is not None:
+            if hit[1] > now:
+                _token_cache.move_to_end(key)
+                return dict(hit[0])
+            del _token_cache[key]
+
+    decoded = _verify_uncached(token)
+
+    with _token_cache_lock:
+        _token_cache[key] = (decoded, decoded.get("exp", now))
+        while len(_token_cache) > config.TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return dict(decoded)
+
+def _verify_uncached(token: str) -> dict:
+    certs = _get_certs()
+    kid = _token_kid(token)
+    if _project_id and kid in certs:
+        return _verify_with_certs(token, certs)
+    if config.AUTH_VERIFY_MODE == "offline":
+        if not _project_id:
+            raise ValueError("No Firebase project id configured for offline token verification.")
+        raise ValueError(f"Signing key {kid!r} not found in {config.FIREBASE_CERTS_PATH}")
+    return firebase_auth.verify_id_token(token)
+
+def _token_kid(token: str) -> str | None:
+    try:
+        return jwt.decode_header(token).get("kid")
+    except Exception:
+        return None
+
+def _verify_with_certs(token: str, certs: dict) -> dict:
+    """Local equivalent of the Admin SDK's ID token checks."""
+    if jwt.decode_header(token).get("alg") != "RS256":
+        raise ValueError("Firebase ID token has incorrect algorithm.")
+    # Checks signature, exp/iat and the aud claim.
+    claims = jwt.decode(token, certs=certs, audience=_project_id)
+    if claims.get("iss") != ISSUER_PREFIX + _project_id:
+        raise ValueError("Firebase ID token has incorrect \"iss\" (issuer) claim.")
+    sub = claims.get("sub")
+    if not isinstance(sub, str) or not sub or len(sub) > 128:
+        raise ValueError("Firebase ID token has an invalid \"sub\" (subject) claim.")
+    claims["uid"] = sub
+    return claims
+
+
+# ── Signing certs ────────────────────────────────────────────────────────────
+_certs = {"signature": None, "certs": {}}
+_refresher_started = False
+_refresher_lock = threading.Lock()
+
+def _get_certs() -> dict:
+    """Certs from FIREBASE_CERTS_PATH, re-read when another worker refreshes the file."""
+    path = config.FIREBASE_CERTS_PATH
+    try:
+        st = os.stat(path)
+    except OSError:
+        return {}
+    signature = (st.st_mtime_ns, st.st_size)
+    if _certs["signature"] != signature:
+        try:
+            with open(path, "r") as f:
+                _certs.update(signature=signature, certs=json.load(f))
+        except Exception as e:
+            print(f"[Firebase Auth] Could not read cached certs: {e}")
+            return {}
+    return _certs["certs"]
+
+def refresh_certs() -> int:
+    """Fetch Google's current signing certs into FIREBASE_CERTS_PATH. Returns max-age seconds."""
+    resp = requests.get(CERTS_URL, timeout=10)
+    resp.raise_for_status()
+    certs = resp.json()
+
+    os.makedirs(os.path.dirname(config.FIREBASE_CERTS_PATH), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(config.FIREBASE_CERTS_PATH), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(certs, f)
+    os.replace(tmp_path, config.FIREBASE_CERTS_PATH)
+
+    max_age = 3600
+    for part in resp.headers.get("Cache-Control", "").split(","):
+        part = part.strip()
+        if part.startswith("max-age="):
+            max_age = int(part[len("max-age="):])
+    return max_age
+
+def start_cert_refresher():
+    """Start the background thread that keeps the cert file fresh (once per process)."""
+    global _refresher_started
+    with _refresher_lock:
+        if _refresher_started:
+            return
+        _refresher_started = True
+    threading.Thread(target=_refresh_loop, name="firebase-cert-refresher", daemon=True).start()
+
+def _refresh_loop():
+    while True:
+        try:
+            max_age = refresh_certs()
+            # Refresh well before Google rotates the keys.
+            delay = max(60, int(max_age * 0.8))
+        except Exception as e:
+            print(f"[Firebase Auth] Cert refresh failed: {e}")
+            delay = 60
+        time.sleep(delay)
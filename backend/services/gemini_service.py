@@ -2,23 +2,150 @@
 NoteNexus — Gemini AI Service
 Handles all interactions with Google Gemini API.
 Uses chunk-summarize-merge-generate pattern to stay within free tier limits.
+The model itself comes from llm_service (LLM_PROVIDER), so calls can also be
+recorded, replayed or faked.
 """
+import re
 import json
 import time
-import google.generativeai as genai
+import random
+import threading
 from backend.config import config
+from backend.services import rate_limit_service
+from backend.services.llm_service import get_provider
 
-# Configure Gemini once
-genai.configure(api_key=config.GEMINI_API_KEY)
-_model = genai.GenerativeModel(config.GEMINI_MODEL)
 
+def estimate_tokens(text: str) -> int:
+    """Rough Gemini token count (~4 characters per token for English text)."""
+    return (len(text) + 3) // 4
 
-def _call_gemini(prompt: str, retries: int = 3) -> str:
-    """Make a Gemini API call with exponential backoff on rate-limit errors."""
+
+_calls = 0
+_calls_lock = threading.Lock()
+
+
+def calls_made() -> int:
+    """Gemini requests this process has sent so far, retries included."""
+    return _calls
+
+
+def _count_call():
+    global _calls
+    with _calls_lock:
+        _calls += 1
+
+
+# ── Circuit breaker ──────────────────────────────────────────────────────────
+# After CIRCUIT_FAILURE_THRESHOLD consecutive failed calls the circuit opens
+# and calls fail immediately with CircuitOpenError instead of retrying and
+# sleeping. After CIRCUIT_RESET_SECONDS one "half-open" probe call is let
+# through: success closes the circuit, failure opens it again. A probe that
+# ends without an answer from Gemini (e.g. it timed out in our own rate-limit
+# queue) reopens the circuit without counting as a failure.
+
+class CircuitOpenError(RuntimeError):
+    """Gemini is failing; the call was not attempted."""
+
+
+_circuit = {"state": "closed", "failures": 0, "opened_at": 0.0}
+_circuit_lock = threading.Lock()
+
+
+def circuit_open() -> bool:
+    """True while calls would currently fail fast (open, and no probe due yet)."""
+    with _circuit_lock:
+        return (_circuit["state"] == "half_open" or
+                (_circuit["state"] == "open"
+                 and time.monotonic() - _circuit["opened_at"] < config.CIRCUIT_RESET_SECONDS))
+
+
+def _before_call() -> bool:
+    """Raise CircuitOpenError if the call may not go out. True if it is the half-open probe."""
+    with _circuit_lock:
+        if _circuit["state"] == "closed":
+            return False
+        if (_circuit["state"] == "open"
+                and time.monotonic() - _circuit["opened_at"] >= config.CIRCUIT_RESET_SECONDS):
+            _circuit["state"] = "half_open"
+            print("[Gemini] Circuit half-open: sending a probe call.")
+            return True
+        raise CircuitOpenError("Gemini is temporarily unavailable. Please try again shortly.")
+
+
+def _record_success():
+    with _circuit_lock:
+        if _circuit["state"] != "closed":
+            print("[Gemini] Circuit closed.")
+        _circuit.update(state="closed", failures=0)
+
+
+def _end_probe():
+    """Called after the probe call; reopens the circuit if the probe got no verdict."""
+    with _circuit_lock:
+        if _circuit["state"] == "half_open":
+            print("[Gemini] Probe call did not reach Gemini; circuit stays open.")
+            _circuit.update(state="open", opened_at=time.monotonic())
+
+
+def _record_failure():
+    with _circuit_lock:
+        _circuit["failures"] += 1
+        if _circuit["state"] == "half_open" or _circuit["failures"] >= config.CIRCUIT_FAILURE_THRESHOLD:
+            if _circuit["state"] != "open":
+                print(f"[Gemini] Circuit OPEN after {_circuit['failures']} failure(s).")
+            _circuit.update(state="open", opened_at=time.monotonic())
+
+
+def _is_rate_limit(err: str) -> bool:
+    return "429" in err or "quota" in err.lower() or "resource exhausted" in err.lower()
+
+
+def _retry_delay(err: str, attempt: int) -> float:
+    """Server-provided retry delay if the error carries one, else jittered exponential backoff."""
+    match = (re.search(r"retry in ([\d.]+)\s*s", err, re.IGNORECASE)
+             or re.search(r"retry_delay\s*\{\s*seconds:\s*(\d+)", err))
+    if match:
+        return float(match.group(1)) + random.uniform(0, 1)
+    return 2 ** attempt * 5 * random.uniform(0.5, 1.5)  # ~5s, 10s, 20s
+
+
+def _prompt_tokens(response) -> int | None:
+    usage = getattr(response, "usage_metadata", None)
+    return getattr(usage, "prompt_token_count", None) if usage else None
+
+
+def _call_gemini(prompt: str, retries: int = 3, schema: dict | None = None) -> str:
+    """
+    Make a Gemini API call through the shared rate limiter. On a 429 every
+    worker pauses for the server's retry delay (or a jittered backoff).
+    Raises CircuitOpenError without calling while the circuit is open.
+    With a schema, Gemini is asked for JSON of that shape (JSON response mode).
+    """
+    probe = _before_call()
+    try:
+        result = _call_with_retries(prompt, retries, schema)
+    except rate_limit_service.RateLimitTimeout:
+        raise  # our own queueing, not a Gemini failure
+    except Exception:
+        _record_failure()
+        raise
+    else:
+        _record_success()
+    finally:
+        if probe:
+            _end_probe()
+    return result
+
+
+def _call_with_retries(prompt: str, retries: int, schema: dict | None) -> str:
+    tokens = estimate_tokens(prompt)
     for attempt in range(retries):
         try:
+            rate_limit_service.acquire(tokens)
             print(f"[Gemini] Calling API (Attempt {attempt + 1}/{retries})...")
-            response = _model.generate_content(prompt)
+            _count_call()
+            response = get_provider().generate_content(prompt, schema=_wire_schema(schema))
+            rate_limit_service.record_usage(tokens, _prompt_tokens(response))
             
             # Check if response actually has text (might be blocked by safety)
             try:
@@ -31,19 +158,251 @@ def _call_gemini(prompt: str, retries: int = 3) -> str:
 
             return "Error: No response from AI."
 
+        except rate_limit_service.RateLimitTimeout:
+            raise
         except Exception as e:
             err = str(e)
             print(f"[Gemini] Raw Error: {err}")
-            if "429" in err or "quota" in err.lower():
-                wait = 2 ** attempt * 5  # 5s, 10s, 20s
-                print(f"[Gemini] Rate limited. Waiting {wait}s before retry {attempt + 1}/{retries}...")
-                time.sleep(wait)
+            if _is_rate_limit(err):
+                wait = _retry_delay(err, attempt)
+                print(f"[Gemini] Rate limited. Pausing Gemini calls {wait:.1f}s before retry {attempt + 1}/{retries}...")
+                rate_limit_service.backoff(wait)
             else:
                 print(f"[Gemini] Fatal Error: {e}")
                 raise
     raise RuntimeError("Gemini API: max retries exceeded.")
 
 
+# ── Structured output ────────────────────────────────────────────────────────
+# JSON replies are requested in Gemini's JSON response mode with a schema,
+# then parsed tolerantly: fences and surrounding prose are dropped, trailing
+# commas removed and truncated strings/arrays/objects closed. The result is
+# checked against the same schema (invalid list items are dropped). Only if
+# that still fails is Gemini asked once to fix its own output — never is a
+# made-up fallback returned, so nothing broken gets cached.
+# Schema keys: type, properties, required, items are sent to Gemini;
+# min_items, max_items, minimum, maximum are only checked locally.
+
+NOTE_SECTIONS = ("definitions", "key_points", "short_notes", "long_answers",
+                 "important_questions", "quick_revision")
+
+_STRING = {"type": "string"}
+
+
+def _strings(min_items: int = 1) -> dict:
+    return {"type": "array", "items": _STRING, "min_items": min_items}
+
+
+def _records(*fields: str, required=None) -> dict:
+    return {
+        "type": "array", "min_items": 1,
+        "items": {"type": "object", "properties": {f: _STRING for f in fields},
+                  "required": list(required or fields)},
+    }
+
+
+NOTES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "definitions": _records("term", "definition"),
+        "key_points": _strings(),
+        "short_notes": _records("title", "content"),
+        "long_answers": _records("question", "answer"),
+        "important_questions": _strings(),
+        "quick_revision": _strings(),
+    },
+    "required": list(NOTE_SECTIONS),
+}
+
+QUIZ_SCHEMA = {
+    "type": "array", "min_items": 1,
+    "items": {
+        "type": "object",
+        "properties": {
+            "question": _STRING,
+            "options": {"type": "array", "items": _STRING, "min_items": 4, "max_items": 4},
+            "answer": {"type": "integer", "minimum": 0, "maximum": 3},
+            "explanation": _STRING,
+        },
+        "required": ["question", "options", "answer"],
+    },
+}
+
+FLASHCARDS_SCHEMA = _records("front", "back")
+
+SUMMARIES_SCHEMA = _strings(min_items=0)
+
+_WIRE_KEYS = ("type", "properties", "required", "items")
+
+
+def _wire_schema(schema: dict | None) -> dict | None:
+    """The part of a schema Gemini's response_schema understands."""
+    if schema is None:
+        return None
+    wire = {k: schema[k] for k in _WIRE_KEYS if k in schema}
+    if "items" in wire:
+        wire["items"] = _wire_schema(wire["items"])
+    if "properties" in wire:
+        wire["properties"] = {k: _wire_schema(v) for k, v in wire["properties"].items()}
+    return wire
+
+
+def conform(value, schema: dict):
+    """
+    value cleaned up to match schema, or None if it can't. Strings are
+    stripped, unknown keys dropped, invalid array items left out.
+    """
+    kind = schema["type"]
+    if kind == "string":
+        return (value.strip() or None) if isinstance(value, str) else None
+    if kind == "integer":
+        if isinstance(value, str) and value.strip().isdigit():
+            value = int(value)
+        if not isinstance(value, int) or isinstance(value, bool):
+            return None
+        if value < schema.get("minimum", value) or value > schema.get("maximum", value):
+            return None
+        return value
+    if kind == "array":
+        if not isinstance(value, list):
+            return None
+        items = [v for v in (conform(item, schema["items"]) for item in value) if v is not None]
+        if len(items) < schema.get("min_items", 0) or len(items) > schema.get("max_items", len(items)):
+            return None
+        return items
+    if kind == "object":
+        if not isinstance(value, dict):
+            return None
+        result = {}
+        for key, sub_schema in schema["properties"].items():
+            item = conform(value.get(key), sub_schema) if key in value else None
+            if item is not None:
+                result[key] = item
+            elif key in schema.get("required", ()):
+                return None
+        return result
+    raise ValueError(f"Unsupported schema type: {kind!r}")
+
+
+def parse_json(raw: str):
+    """
+    Parse a model's JSON reply, repairing what a model typically gets wrong:
+    ``` fences, prose around the JSON, trailing commas, literal newlines in
+    strings, and output cut off mid-way. Raises ValueError if nothing parses.
+    """
+    text = _extract_json(raw)
+    if text is None:
+        raise ValueError("No JSON found in the response.")
+    for candidate in [text] + _repaired(text):
+        try:
+            return json.loads(candidate, strict=False)
+        except ValueError:
+            continue
+    raise ValueError("Response is not valid JSON.")
+
+
+def _extract_json(raw: str) -> str | None:
+    text = re.sub(r"```[a-zA-Z]*", "", raw)
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    return text[min(starts):].strip() if starts else None
+
+
+def _repaired(text: str) -> list[str]:
+    """
+    Repair candidates for JSON text that starts at its opening bracket: the
+    text closed where it stops, then the text cut back to the last complete
+    element and closed there.
+    """
+    out, stack = [], []
+    in_string = escaped = False
+    last_comma = None  # (len(out), open brackets) at the last top-of-value comma
+    for c in text:
+        if in_string:
+            out.append(c)
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == '"':
+                in_string = False
+            continue
+        if c == '"':
+            in_string = True
+        elif c in "{[":
+            stack.append("}" if c == "{" else "]")
+        elif c in "}]":
+            _drop_trailing_comma(out)
+            if not stack:
+                break
+            out.append(stack.pop())  # a mismatched bracket gets the expected one
+            if not stack:
+                return ["".join(out)]  # complete; anything after it is prose
+            continue
+        elif c == "," and stack:
+            last_comma = (len(out), list(stack))
+        out.append(c)
+
+    closed = out + (['"'] if in_string else [])
+    _drop_trailing_comma(closed)
+    if closed and closed[-1] == ":":
+        closed.append("null")
+    candidates = ["".join(closed) + "".join(reversed(stack))]
+    if last_comma:
+        length, open_brackets = last_comma
+        candidates.append("".join(out[:length]) + "".join(reversed(open_brackets)))
+    return candidates
+
+
+def _drop_trailing_comma(out: list):
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+
+def _validated(raw: str, schema: dict):
+    try:
+        return conform(parse_json(raw), schema)
+    except ValueError:
+        return None
+
+
+def _structured(raw: str, schema: dict, what: str):
+    """
+    raw parsed and conformed to schema. As a last resort Gemini is asked once
+    to fix its own reply; raises ValueError if that fails too.
+    """
+    value = _validated(raw, schema)
+    if value is not None:
+        return value
+    if _extract_json(raw) is None:
+        # Blocked or error text — there's no JSON to fix.
+        raise ValueError(f"Gemini returned no {what}: {raw[:200]}")
+    print(f"[Gemini] {what} JSON is malformed or incomplete — asking Gemini to fix it.")
+    value = _validated(_call_gemini(_fix_prompt(raw, schema), schema=schema), schema)
+    if value is None:
+        raise ValueError(f"Gemini returned malformed {what}. Please try again.")
+    return value
+
+
+def _fix_prompt(raw: str, schema: dict) -> str:
+    return f"""The text below was meant to be one valid JSON value matching this JSON schema,
+but it is malformed, cut off, or has the wrong shape.
+
+SCHEMA:
+{json.dumps(_wire_schema(schema))}
+
+TEXT:
+{raw}
+
+Return ONLY the corrected JSON (no markdown, no code blocks). Keep all of the original content
+and complete anything that was cut off."""
+
+
+# Bump whenever the summarize_chunk prompt changes; cached summaries are keyed on it.
+SUMMARY_PROMPT_VERSION = 1
+
+
 def summarize_chunk(chunk: str) -> str:
     """
     Summarize a single chunk of academic text.
@@ -61,10 +420,42 @@ SUMMARY (bullet points only):"""
     return _call_gemini(prompt)
 
 
+# Bump whenever the summarize_chunks_batch prompt changes; summaries it produced are keyed on it.
+BATCH_SUMMARY_PROMPT_VERSION = 1
+
+
+def summarize_chunks_batch(chunks: list[str]) -> list[str] | None:
+    """
+    Summarize several chunks in ONE Gemini request (the free tier is limited
+    by requests per minute, not tokens). Returns one summary per chunk, in
+    order, or None if the reply isn't a JSON array of exactly that many
+    summaries — callers then fall back to summarize_chunk.
+    """
+    sections = "\n\n".join(f"### SECTION {i}\n{chunk}" for i, chunk in enumerate(chunks, 1))
+    prompt = f"""You are a BCA academic assistant for KBCNMU, India.
+
+Below are {len(chunks)} separate sections of academic text. Summarize EACH section on its own
+in clear, concise bullet points (maximum 200 words per section).
+Focus on key concepts, definitions, and important facts only.
+
+{sections}
+
+Return ONLY a valid JSON array of exactly {len(chunks)} strings (no markdown, no code blocks),
+where string i is the bullet-point summary of SECTION i."""
+
+    # No fix-up call here: falling back to per-chunk summaries costs no more.
+    summaries = _validated(_call_gemini(prompt, schema=SUMMARIES_SCHEMA), SUMMARIES_SCHEMA)
+    if summaries is None or len(summaries) != len(chunks):
+        print(f"[Gemini] Batch summary returned the wrong shape for {len(chunks)} sections.")
+        return None
+    return summaries
+
+
 def generate_notes(merged_content: str, unit_title: str) -> dict:
     """
     Generate structured, exam-oriented BCA notes from merged content.
-    Returns a dict with all 6 note categories.
+    Returns a dict with all 6 note categories; raises ValueError if Gemini's
+    reply can't be turned into one.
     """
     prompt = f"""You are an expert BCA professor at KBCNMU (Kavayitri Bahinabai Chaudhari North Maharashtra University), Jalgaon.
 You follow the NEP 2020 curriculum for BCA students.
@@ -100,35 +491,11 @@ Rules:
 
 Language: Simple English, scoring-focused, suitable for BCA students."""
 
-    raw = _call_gemini(prompt)
+    return _structured(_call_gemini(prompt, schema=NOTES_SCHEMA), NOTES_SCHEMA, "notes")
 
-    # Strip markdown code fences if Gemini wraps response
-    if "```" in raw:
-        lines = raw.split("\n")
-        raw = "\n".join(l for l in lines if not l.strip().startswith("```"))
-
-    try:
-        notes = json.loads(raw)
-    except json.JSONDecodeError:
-        # Fallback - wrap content in a basic structure
-        print("[Gemini] JSON parse failed, using fallback structure.")
-        notes = {
-            "definitions": [{"term": "Content", "definition": raw[:500]}],
-            "key_points": [raw[500:1000]],
-            "short_notes": [{"title": unit_title, "content": raw[1000:1500]}],
-            "long_answers": [{"question": f"Explain {unit_title}", "answer": raw[1500:2000]}],
-            "important_questions": [f"Describe the concept of {unit_title}"],
-            "quick_revision": ["Review the uploaded PDF for more details."]
-        }
-
-    return notes
 
-def generate_notes_from_topic(topic: str) -> dict:
-    """
-    Generate structured, exam-oriented BCA notes from a user-provided topic.
-    Returns a dict with all 6 note categories.
-    """
-    prompt = f"""You are an expert BCA professor at KBCNMU (Kavayitri Bahinabai Chaudhari North Maharashtra University), Jalgaon.
+def _topic_prompt(topic: str) -> str:
+    return f"""You are an expert BCA professor at KBCNMU (Kavayitri Bahinabai Chaudhari North Maharashtra University), Jalgaon.
 You follow the NEP 2020 curriculum for BCA students.
 
 Based on the topic "{topic}", generate comprehensive, exam-oriented study notes.
@@ -160,33 +527,162 @@ Rules:
 
 Language: Simple English, scoring-focused, suitable for BCA students."""
 
-    raw = _call_gemini(prompt)
 
-    # Strip markdown code fences if Gemini wraps response
-    if "```" in raw:
-        lines = raw.split("\n")
-        raw = "\n".join(l for l in lines if not l.strip().startswith("```"))
+def generate_notes_from_topic(topic: str) -> dict:
+    """
+    Generate structured, exam-oriented BCA notes from a user-provided topic.
+    Returns a dict with all 6 note categories; raises ValueError if Gemini's
+    reply can't be turned into one.
+    """
+    return _structured(_call_gemini(_topic_prompt(topic), schema=NOTES_SCHEMA), NOTES_SCHEMA, "notes")
 
+
+def stream_notes_from_topic(topic: str):
+    """
+    Streaming variant of generate_notes_from_topic. Yields (section, value)
+    pairs as soon as each top-level section of Gemini's JSON is complete,
+    so the first section reaches the student long before the last one is
+    written. Every section in NOTE_SECTIONS is yielded exactly once, already
+    conformed to NOTES_SCHEMA; raises ValueError if the reply can't be repaired.
+    """
+    parser = _SectionParser()
+    parts, sent = [], set()
+    sections = NOTES_SCHEMA["properties"]
+    for text in _stream_gemini(_topic_prompt(topic), schema=NOTES_SCHEMA):
+        parts.append(text)
+        for section, value in parser.feed(text):
+            value = conform(value, sections[section]) if section in sections else None
+            if value is not None and section not in sent:
+                sent.add(section)
+                yield section, value
+
+    # Anything the incremental parse missed (malformed or truncated JSON)
+    if len(sent) < len(NOTE_SECTIONS):
+        notes = _structured("".join(parts).strip(), NOTES_SCHEMA, "notes")
+        for section in NOTE_SECTIONS:
+            if section not in sent:
+                yield section, notes[section]
+
+
+def _stream_gemini(prompt: str, retries: int = 3, schema: dict | None = None):
+    """Like _call_gemini, but yields text as Gemini produces it."""
+    probe = _before_call()
     try:
-        notes = json.loads(raw)
-    except json.JSONDecodeError:
-        # Fallback
-        print("[Gemini] JSON parse failed, using fallback structure.")
-        notes = {
-            "definitions": [{"term": "Topic Info", "definition": raw[:500]}],
-            "key_points": [raw[500:1000]],
-            "short_notes": [{"title": topic, "content": raw[1000:1500]}],
-            "long_answers": [{"question": f"Explain {topic}", "answer": raw[1500:2000]}],
-            "important_questions": [f"Describe the concept of {topic}"],
-            "quick_revision": ["Review the generated notes for more details."]
-        }
-
-    return notes
+        yield from _stream_with_retries(prompt, retries, schema)
+    except GeneratorExit:
+        # Client went away mid-stream; Gemini itself was answering fine.
+        _record_success()
+        raise
+    except rate_limit_service.RateLimitTimeout:
+        raise
+    except Exception:
+        _record_failure()
+        raise
+    else:
+        _record_success()
+    finally:
+        if probe:
+            _end_probe()
+
+
+def _stream_with_retries(prompt: str, retries: int, schema: dict | None):
+    tokens = estimate_tokens(prompt)
+    for attempt in range(retries):
+        started = False
+        try:
+            rate_limit_service.acquire(tokens)
+            print(f"[Gemini] Streaming API call (Attempt {attempt + 1}/{retries})...")
+            _count_call()
+            for chunk in get_provider().generate_content(prompt, stream=True, schema=_wire_schema(schema)):
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Blocked by safety filters mid-stream
+                    print("[Gemini] Error: Streamed response was blocked or empty.")
+                    return
+                if text:
+                    started = True
+                    yield text
+            return
+        except rate_limit_service.RateLimitTimeout:
+            raise
+        except Exception as e:
+            err = str(e)
+            print(f"[Gemini] Raw Error: {err}")
+            # Once text has gone out a retry would duplicate it
+            if not started and _is_rate_limit(err):
+                wait = _retry_delay(err, attempt)
+                print(f"[Gemini] Rate limited. Pausing Gemini calls {wait:.1f}s before retry {attempt + 1}/{retries}...")
+                rate_limit_service.backoff(wait)
+            else:
+                print(f"[Gemini] Fatal Error: {e}")
+                raise
+    raise RuntimeError("Gemini API: max retries exceeded.")
+
+
+class _SectionParser:
+    """
+    Incremental scanner for a streamed top-level JSON object. feed() returns
+    the (key, value) pairs whose values became complete in the new text.
+    Text before the opening brace (e.g. a ```json fence) is ignored.
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = None
+        self._key = None
+        self._value_start = None
+
+    def feed(self, text: str) -> list:
+        self._buf += text
+        done = []
+        while self._pos < len(self._buf):
+            c = self._buf[self._pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif c == "\\":
+                    self._escaped = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._value_start is None:
+                        self._key = self._buf[self._string_start:self._pos + 1]
+            elif c == '"':
+                self._in_string = True
+                self._string_start = self._pos
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}]":
+                if self._depth == 1 and self._value_start is not None:
+                    self._finish(done)
+                self._depth -= 1
+            elif self._depth == 1:
+                if c == ":" and self._value_start is None:
+                    self._value_start = self._pos + 1
+                elif c == "," and self._value_start is not None:
+                    self._finish(done)
+            self._pos += 1
+        return done
+
+    def _finish(self, done: list):
+        raw_value = self._buf[self._value_start:self._pos]
+        self._value_start = None
+        try:
+            done.append((json.loads(self._key), json.loads(raw_value)))
+        except (TypeError, ValueError):
+            pass  # left for the full-response parse
+        self._key = None
+
 
 def generate_quiz(unit_title: str, notes_content: str) -> list:
     """
     Generate 5-10 multiple choice questions based on the notes content.
-    Returns a list of question objects.
+    Returns a list of question objects; raises ValueError if Gemini's reply
+    can't be turned into one.
     """
     prompt = f"""You are an educational quiz generator. 
 Based on the following notes about "{unit_title}", generate 5-10 high-quality Multiple Choice Questions (MCQs).
@@ -208,23 +704,13 @@ Rules:
 - "answer" must be the index (0-3) of the correct option.
 - Language: Simple English.
 """
-    raw = _call_gemini(prompt)
-
-    # Strip markdown code fences
-    if "```" in raw:
-        lines = raw.split("\n")
-        raw = "\n".join(l for l in lines if not l.strip().startswith("```"))
-
-    try:
-        return json.loads(raw)
-    except json.JSONDecodeError:
-        print("[Gemini] Quiz JSON parse failed.")
-        return []
+    return _structured(_call_gemini(prompt, schema=QUIZ_SCHEMA), QUIZ_SCHEMA, "quiz")
 
 def generate_flashcards(unit_title: str, notes_content: str) -> list:
     """
     Generate 10-15 flashcards (Question/Answer pairs) based on the notes content.
-    Returns a list of flashcard objects.
+    Returns a list of flashcard objects; raises ValueError if Gemini's reply
+    can't be turned into one.
     """
     prompt = f"""You are an educational flashcard generator. 
 Based on the following notes about "{unit_title}", generate 10-15 effective Flashcards for quick revision.
@@ -245,15 +731,4 @@ Rules:
 - Back should be a concise, easy-to-remember answer.
 - Language: Simple English.
 """
-    raw = _call_gemini(prompt)
-
-    # Strip markdown code fences
-    if "```" in raw:
-        lines = raw.split("\n")
-        raw = "\n".join(l for l in lines if not l.strip().startswith("```"))
-
-    try:
-        return json.loads(raw)
-    except json.JSONDecodeError:
-        print("[Gemini] Flashcards JSON parse failed.")
-        return []
+    return _structured(_call_gemini(prompt, schema=FLASHCARDS_SCHEMA), FLASHCARDS_SCHEMA, "flashcards")
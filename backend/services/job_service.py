@@ -0,0 +1,260 @@
+"""
+NoteNexus — Job Service
+Persistent background queue for slow AI work (notes, quiz, flashcards,
+topic notes). Jobs live in a SQLite file shared by all gunicorn workers;
+each worker process runs JOB_WORKERS daemon threads that claim and run them.
+Web requests only enqueue and return 202 with a job id, so a cold generation
+no longer holds a request worker or runs into gunicorn's timeout.
+Jobs a student is waiting on are claimed first and call Gemini at
+INTERACTIVE priority; admin regenerations and jobs queued with
+"background": True in their payload (nobody waiting) run at NORMAL.
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from backend.config import config
+from backend.services import rate_limit_service
+from backend.services.rate_limit_service import INTERACTIVE, NORMAL
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    dedupe_key  TEXT,
+    payload     TEXT NOT NULL,
+    status      TEXT NOT NULL,          -- queued | running | done | failed
+    result      TEXT,
+    error       TEXT,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    worker      TEXT,
+    created_at  REAL NOT NULL,
+    started_at  REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_dedupe ON jobs(dedupe_key, status);
+-- Users who queued (or joined, via dedupe_key) a job; only they can read it.
+CREATE TABLE IF NOT EXISTS job_users (
+    job_id TEXT NOT NULL,
+    uid    TEXT NOT NULL,
+    PRIMARY KEY (job_id, uid)
+);
+"""
+
+# kind -> priority of its Gemini calls; also the order queued jobs are claimed in
+_PRIORITY = {
+    "notes": INTERACTIVE,
+    "quiz": INTERACTIVE,
+    "flashcards": INTERACTIVE,
+    "topic": INTERACTIVE,
+    "regenerate": NORMAL,
+}
+_CLAIM_ORDER = "CASE kind {} ELSE {} END, created_at".format(
+    " ".join(f"WHEN '{kind}' THEN {level}" for kind, level in _PRIORITY.items()), NORMAL)
+
+_local = threading.local()
+_workers_started = False
+_workers_lock = threading.Lock()
+
+
+def _connect() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(config.JOBS_DB_PATH), exist_ok=True)
+        conn = sqlite3.connect(config.JOBS_DB_PATH, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.executescript(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def _handlers() -> dict:
+    # Imported lazily so enqueueing/polling doesn't load the Gemini client.
+    from backend.services import notes_service
+    return {
+        "notes": lambda p: notes_service.get_or_generate_notes(p["unitId"]),
+        "regenerate": lambda p: notes_service.force_regenerate_notes(p["unitId"]),
+        "quiz": lambda p: notes_service.generate_unit_quiz(p["unitId"]),
+        "flashcards": lambda p: notes_service.generate_unit_flashcards(p["unitId"]),
+        "topic": lambda p: notes_service.generate_topic_notes(p["topic"]),
+    }
+
+
+def _to_dict(row) -> dict:
+    job = {
+        "id": row["id"],
+        "kind": row["kind"],
+        "status": row["status"],
+        "attempts": row["attempts"],
+        "createdAt": row["created_at"],
+        "startedAt": row["started_at"],
+        "finishedAt": row["finished_at"],
+    }
+    if row["result"]:
+        job["result"] = json.loads(row["result"])
+    if row["error"]:
+        job["error"] = row["error"]
+    return job
+
+
+# ── Public API ────────────────────────────────────────────────────────────────
+
+def enqueue(kind: str, payload: dict, dedupe_key: str | None = None, uid: str | None = None) -> dict:
+    """
+    Queue a job on behalf of uid and return it. If a queued or running job
+    with the same dedupe_key exists, uid joins that job instead of adding another.
+    """
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = None
+        if dedupe_key:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE dedupe_key = ? AND status IN ('queued', 'running') "
+                "ORDER BY created_at LIMIT 1", (dedupe_key,)
+            ).fetchone()
+        created = row is None
+        if created:
+            job_id = str(uuid.uuid4())
+            conn.execute(
+                "INSERT INTO jobs (id, kind, dedupe_key, payload, status, created_at) VALUES (?, ?, ?, ?, 'queued', ?)",
+                (job_id, kind, dedupe_key, json.dumps(payload), time.time()),
+            )
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if uid:
+            conn.execute("INSERT OR IGNORE INTO job_users (job_id, uid) VALUES (?, ?)", (row["id"], uid))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    if created:
+        print(f"[Jobs] Queued {kind} job {row['id']}")
+    return _to_dict(row)
+
+
+def get_job(job_id: str) -> dict | None:
+    row = _connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _to_dict(row) if row else None
+
+
+def get_job_for(job_id: str, uid: str) -> dict | None:
+    """The job, if uid queued or joined it; None otherwise."""
+    row = _connect().execute(
+        "SELECT jobs.* FROM jobs JOIN job_users ON job_users.job_id = jobs.id "
+        "WHERE jobs.id = ? AND job_users.uid = ?", (job_id, uid)
+    ).fetchone()
+    return _to_dict(row) if row else None
+
+
+def run_pending(max_jobs: int | None = None) -> int:
+    """Run queued jobs in the calling thread until the queue is empty. Returns the count run."""
+    count = 0
+    while max_jobs is None or count < max_jobs:
+        job = _claim()
+        if not job:
+            break
+        _run(job)
+        count += 1
+    return count
+
+
+def start_workers():
+    """Start this process's JOB_WORKERS worker threads (idempotent)."""
+    global _workers_started
+    with _workers_lock:
+        if _workers_started or config.JOB_WORKERS <= 0:
+            return
+        _workers_started = True
+    for i in range(config.JOB_WORKERS):
+        threading.Thread(target=_worker_loop, name=f"job-worker-{i}", daemon=True).start()
+    print(f"[Jobs] Started {config.JOB_WORKERS} worker thread(s) in pid {os.getpid()}")
+
+
+# ── Worker internals ──────────────────────────────────────────────────────────
+
+def _worker_loop():
+    while True:
+        try:
+            job = _claim()
+            if job:
+                _run(job)
+            else:
+                time.sleep(config.JOB_POLL_INTERVAL)
+        except Exception as e:
+            print(f"[Jobs] Worker error: {e}")
+            time.sleep(config.JOB_POLL_INTERVAL)
+
+
+def _claim() -> sqlite3.Row | None:
+    """Atomically take the most urgent queued job, requeueing jobs orphaned by dead workers."""
+    conn = _connect()
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # A job still 'running' past JOB_TIMEOUT belonged to a worker that died.
+        conn.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+            "error = CASE WHEN attempts >= ? THEN 'Job timed out' ELSE error END, "
+            "finished_at = CASE WHEN attempts >= ? THEN ? ELSE finished_at END "
+            "WHERE status = 'running' AND started_at < ?",
+            (config.JOB_MAX_ATTEMPTS, config.JOB_MAX_ATTEMPTS, config.JOB_MAX_ATTEMPTS, now,
+             now - config.JOB_TIMEOUT),
+        )
+        conn.execute(
+            "DELETE FROM job_users WHERE job_id IN "
+            "(SELECT id FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?)",
+            (now - config.JOB_RETENTION,),
+        )
+        conn.execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+            (now - config.JOB_RETENTION,),
+        )
+        row = conn.execute(
+            f"SELECT * FROM jobs WHERE status = 'queued' ORDER BY {_CLAIM_ORDER} LIMIT 1"
+        ).fetchone()
+        if row:
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?, started_at = ? WHERE id = ?",
+                (f"{os.getpid()}:{threading.get_ident()}", now, row["id"]),
+            )
+        conn.execute("COMMIT")
+        return row
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _run(job: sqlite3.Row):
+    conn = _connect()
+    print(f"[Jobs] Running {job['kind']} job {job['id']}")
+    try:
+        handler = _handlers()[job["kind"]]
+        payload = json.loads(job["payload"])
+        level = NORMAL if payload.get("background") else _PRIORITY.get(job["kind"], NORMAL)
+        with rate_limit_service.priority(level):
+            result = handler(payload)
+    except Exception as e:
+        print(f"[Jobs] {job['kind']} job {job['id']} failed: {e}")
+        conn.execute(
+            "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+            (str(e), time.time(), job["id"]),
+        )
+        return
+
+    if result.get("status") == "pending":
+        # Another worker holds the unit lock; try again on a later claim.
+        conn.execute("UPDATE jobs SET status = 'queued', attempts = attempts - 1 WHERE id = ?", (job["id"],))
+        return
+
+    status = "failed" if result.get("status") == "error" else "done"
+    conn.execute(
+        "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+        (status, json.dumps(result), result.get("message") if status == "failed" else None,
+         time.time(), job["id"]),
+    )
+    print(f"[Jobs] {job['kind']} job {job['id']} {status}")
@@ -0,0 +1,198 @@
+"""
+NoteNexus — LLM Provider
+The model gemini_service talks to, chosen by LLM_PROVIDER:
+  gemini — Google Gemini (default; needs GEMINI_API_KEY and network)
+  record — Gemini, saving every prompt/response pair to LLM_RECORD_DIR
+  replay — answers from LLM_RECORD_DIR; unrecorded prompts get fake answers
+  fake   — synthesized, schema-valid answers for every prompt gemini_service sends
+replay and fake need no network or quota and add LLM_FAKE_LATENCY seconds
+per call plus injected failures (LLM_FAKE_ERROR_RATE, LLM_FAKE_RATE_LIMIT_RATE),
+so the pipeline can be benchmarked reproducibly on a laptop.
+
+Every provider has the one method gemini_service uses:
+generate_content(prompt, stream=False, schema=None) -> response with .text
+and .usage_metadata, or an iterator of chunks with .text when streaming.
+A schema asks for JSON of that shape; providers that can't enforce one
+ignore it.
+"""
+import os
+import json
+import time
+import random
+import hashlib
+import tempfile
+import threading
+from types import SimpleNamespace
+from backend.config import config
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    """The process-wide provider for LLM_PROVIDER, created on first use."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = _create(config.LLM_PROVIDER)
+                print(f"[LLM] Using '{config.LLM_PROVIDER}' provider")
+    return _provider
+
+
+def _create(name: str):
+    if name == "gemini":
+        return GeminiProvider()
+    if name == "record":
+        return RecordingProvider(GeminiProvider())
+    if name == "replay":
+        return ReplayProvider()
+    if name == "fake":
+        return FakeProvider()
+    raise ValueError(f"Unknown LLM_PROVIDER: {name!r}")
+
+
+def _response(text: str, prompt: str):
+    usage = SimpleNamespace(prompt_token_count=(len(prompt) + 3) // 4)
+    return SimpleNamespace(text=text, usage_metadata=usage)
+
+
+def _recording_path(prompt: str) -> str:
+    key = hashlib.sha256(f"{config.GEMINI_MODEL}\0{prompt}".encode("utf-8")).hexdigest()
+    return os.path.join(config.LLM_RECORD_DIR, f"{key}.json")
+
+
+class GeminiProvider:
+    """Google Gemini via google.generativeai, configured on first use."""
+
+    def __init__(self):
+        import google.generativeai as genai
+        genai.configure(api_key=config.GEMINI_API_KEY)
+        self._model = genai.GenerativeModel(config.GEMINI_MODEL)
+
+    def generate_content(self, prompt: str, stream: bool = False, schema: dict | None = None):
+        generation_config = None
+        if schema is not None:
+            generation_config = {"response_mime_type": "application/json", "response_schema": schema}
+        return self._model.generate_content(prompt, stream=stream, generation_config=generation_config)
+
+
+def _text(response) -> str:
+    """response.text, or "" for a blocked response (left for gemini_service to report)."""
+    try:
+        return response.text or ""
+    except ValueError:
+        return ""
+
+
+class RecordingProvider:
+    """Passes calls through to `inner` and saves each prompt with its full response text."""
+
+    def __init__(self, inner):
+        self._inner = inner
+        os.makedirs(config.LLM_RECORD_DIR, exist_ok=True)
+
+    def generate_content(self, prompt: str, stream: bool = False, schema: dict | None = None):
+        if stream:
+            return self._stream(prompt, schema)
+        response = self._inner.generate_content(prompt, schema=schema)
+        self._save(prompt, _text(response))
+        return response
+
+    def _stream(self, prompt: str, schema: dict | None):
+        parts = []
+        for chunk in self._inner.generate_content(prompt, stream=True, schema=schema):
+            parts.append(_text(chunk))
+            yield chunk
+        self._save(prompt, "".join(parts))
+
+    @staticmethod
+    def _save(prompt: str, text: str):
+        fd, tmp_path = tempfile.mkstemp(dir=config.LLM_RECORD_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"model": config.GEMINI_MODEL, "prompt": prompt, "text": text}, f)
+        os.replace(tmp_path, _recording_path(prompt))
+
+
+class FakeProvider:
+    """Offline provider: injected latency/failures, then a synthesized answer."""
+
+    def __init__(self):
+        self._random = random.Random(config.LLM_FAKE_SEED)
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt: str, stream: bool = False, schema: dict | None = None):
+        self._inject()
+        text = self._answer(prompt)
+        if stream:
+            return self._stream(text)
+        return _response(text, prompt)
+
+    def _answer(self, prompt: str) -> str:
+        return synthesize(prompt)
+
+    def _inject(self):
+        with self._lock:
+            roll = self._random.random()
+            jitter = self._random.uniform(0.8, 1.2)
+        if config.LLM_FAKE_LATENCY:
+            time.sleep(config.LLM_FAKE_LATENCY * jitter)
+        if roll < config.LLM_FAKE_RATE_LIMIT_RATE:
+            raise RuntimeError("429 Resource has been exhausted (injected). Please retry in 1s.")
+        if roll < config.LLM_FAKE_RATE_LIMIT_RATE + config.LLM_FAKE_ERROR_RATE:
+            raise RuntimeError("503 The model is overloaded (injected).")
+
+    @staticmethod
+    def _stream(text: str, size: int = 40):
+        delay = config.LLM_FAKE_LATENCY / max(1, len(text) // size)
+        for i in range(0, len(text), size):
+            if delay:
+                time.sleep(delay)
+            yield SimpleNamespace(text=text[i:i + size])
+
+
+class ReplayProvider(FakeProvider):
+    """Serves responses recorded by RecordingProvider; unrecorded prompts fall back to fake answers."""
+
+    def _answer(self, prompt: str) -> str:
+        try:
+            with open(_recording_path(prompt), "r") as f:
+                return json.load(f)["text"]
+        except (OSError, ValueError, KeyError):
+            print("[LLM] No recording for prompt — using a synthesized answer.")
+            return synthesize(prompt)
+
+
+# ── Synthesized answers ───────────────────────────────────────────────────────
+# Recognizes each prompt gemini_service builds and returns text that parses
+# into what the caller expects.
+
+def synthesize(prompt: str) -> str:
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+    if "### SECTION" in prompt and "JSON array" in prompt:
+        count = prompt.count("### SECTION")
+        return json.dumps([f"- Key idea {i} of batch {digest}\n- Supporting fact {i}" for i in range(1, count + 1)])
+    if "SUMMARY (bullet points only)" in prompt:
+        return f"- Key idea from section {digest}\n- Important definition\n- Exam-relevant fact"
+    if '"definitions"' in prompt:
+        return json.dumps(_fake_notes(digest))
+    if "Multiple Choice Questions" in prompt:
+        return json.dumps([
+            {"question": f"Sample question {i} ({digest})?", "options": ["A", "B", "C", "D"],
+             "answer": i % 4, "explanation": "Synthesized by the fake LLM provider."}
+            for i in range(1, 6)
+        ])
+    if "Flashcards" in prompt:
+        return json.dumps([{"front": f"Term {i} ({digest})", "back": f"Definition {i}"} for i in range(1, 11)])
+    return f"Synthesized response {digest}."
+
+
+def _fake_notes(digest: str) -> dict:
+    return {
+        "definitions": [{"term": f"Term {i}", "definition": f"Definition {i} ({digest})."} for i in range(1, 6)],
+        "key_points": [f"Key point {i}." for i in range(1, 9)],
+        "short_notes": [{"title": f"Topic {i}", "content": "Short exam-ready note. " * 10} for i in range(1, 4)],
+        "long_answers": [{"question": f"Explain concept {i}.", "answer": "Detailed answer. " * 40} for i in range(1, 4)],
+        "important_questions": [f"Question {i}?" for i in range(1, 11)],
+        "quick_revision": [f"Fact {i}." for i in range(1, 11)],
+    }
@@ -6,46 +6,251 @@ Data stored in backend/data/ directory.
 import os
 import json
 import uuid
+import tempfile
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from backend.config import config
+from backend.services.file_lock import FileLock
+from backend.services.unit_files import remove_unit_files, remove_if_exists
+
+# Lookup fields indexed for each collection. Rows are parsed once per process
+# and re-read only when the file's (mtime, size, inode) signature changes, so
+# writes made by another gunicorn worker are picked up on the next access.
+_INDEXED_FIELDS = {
+    "semesters.json": ("id",),
+    "subjects.json": ("id", "semesterId"),
+    "units.json": ("id", "subjectId"),
+    "uploaded_pdfs.json": ("id", "unitId"),
+    "users.json": ("uid",),
+}
+
+_cache = {}
+_cache_lock = threading.Lock()
 
 # Helper to load/save JSON data
 def _get_path(filename):
     return os.path.join(config.DATA_DIR, filename)
 
-def _load_json(filename):
-    path = _get_path(filename)
-    if not os.path.exists(path):
-        return []
+def _file_signature(path):
     try:
-        with open(path, "r") as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"[Storage] Error loading {filename}: {e}")
-        return []
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
 
-def _save_json(filename, data):
+def _build_indexes(filename, rows):
+    indexes = {}
+    for field in _INDEXED_FIELDS.get(filename, ()):
+        index = {}
+        for row in rows:
+            index.setdefault(row.get(field), []).append(row)
+        indexes[field] = index
+    return indexes
+
+def _get_collection(filename):
+    """Return the cached {"rows", "indexes"} entry for a collection, reloading it if the file changed."""
     path = _get_path(filename)
+    signature = _file_signature(path)
+    entry = _cache.get(filename)
+    if entry is not None and entry["signature"] == signature:
+        return entry
+
+    with _cache_lock:
+        entry = _cache.get(filename)
+        if entry is not None and entry["signature"] == signature:
+            return entry
+        rows = []
+        if signature is not None:
+            try:
+                with open(path, "r") as f:
+                    rows = json.load(f)
+            except Exception as e:
+                print(f"[Storage] Error loading {filename}: {e}")
+                # Don't cache a failed parse; retry on the next access.
+                return {"signature": None, "rows": [], "indexes": _build_indexes(filename, [])}
+        entry = {"signature": signature, "rows": rows, "indexes": _build_indexes(filename, rows)}
+        _cache[filename] = entry
+        return entry
+
+def _find(filename, field, value) -> list:
+    """Indexed lookup. Returns copies so callers can't mutate the cache."""
+    rows = _get_collection(filename)["indexes"][field].get(value, [])
+    return [dict(row) for row in rows]
+
+def _find_one(filename, field, value) -> dict | None:
+    rows = _get_collection(filename)["indexes"][field].get(value)
+    return dict(rows[0]) if rows else None
+
+def _load_json(filename):
+    """Return a mutable copy of a collection, for read-modify-write callers."""
+    return [dict(row) for row in _get_collection(filename)["rows"]]
+
+def _write_temp(filename, data):
+    """Serialize a collection to a temp file beside it. Returns (tmp_path, signature)."""
+    fd, tmp_path = tempfile.mkstemp(dir=config.DATA_DIR, prefix=f".{filename}.", suffix=".tmp")
     try:
-        with open(path, "w") as f:
+        with os.fdopen(fd, "w") as f:
             json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    # rename() keeps the inode and mtime, so this is the signature the
+    # target will have once replaced.
+    return tmp_path, _file_signature(tmp_path)
+
+def _install(filename, tmp_path, signature, data):
+    """Rename a staged temp file over its collection and prime the cache with it."""
+    os.replace(tmp_path, _get_path(filename))
+    rows = [dict(row) for row in data]
+    with _cache_lock:
+        _cache[filename] = {"signature": signature, "rows": rows, "indexes": _build_indexes(filename, rows)}
+
+def _save_json(filename, data):
+    # Temp file + rename so readers in other workers never see a half-written file.
+    try:
+        tmp_path, signature = _write_temp(filename, data)
+        _install(filename, tmp_path, signature, data)
     except Exception as e:
         print(f"[Storage] Error saving {filename}: {e}")
 
 def _get_item_by_id(data, item_id):
     return next((item for item in data if item["id"] == item_id), None)
 
+# --- Batch Mutations ---
+# Every catalog write runs as a unit of work: collections are loaded once
+# under a cross-process lock, changed in memory, staged to temp files and then
+# renamed into place. A journal listing the staged renames is written before
+# the first rename, so a crash midway is rolled forward by the next batch.
+_STORAGE_LOCK = "storage.lock"
+_JOURNAL = "storage_journal.json"
+
+class StorageBatch:
+    """In-memory view of the collections touched by one batch(); see batch()."""
+
+    def __init__(self):
+        self._data = {}
+        self._cleanup_units = set()
+        self._cleanup_files = set()
+
+    def rows(self, filename) -> list:
+        """Mutable rows of a collection. Every collection touched here is written on commit."""
+        if filename not in self._data:
+            self._data[filename] = _load_json(filename)
+        return self._data[filename]
+
+    def set_rows(self, filename, rows: list):
+        self._data[filename] = rows
+
+    def delete_semester(self, semester_id: str):
+        self.delete_catalog(semester_ids=[semester_id])
+
+    def delete_subject(self, subject_id: str):
+        self.delete_catalog(subject_ids=[subject_id])
+
+    def delete_unit(self, unit_id: str):
+        self.delete_catalog(unit_ids=[unit_id])
+
+    def delete_catalog(self, semester_ids=(), subject_ids=(), unit_ids=()):
+        """
+        Cascade-delete semesters → subjects → units → PDF rows in one pass per
+        collection. Generated notes and uploaded files go after commit.
+        """
+        semester_ids, subject_ids, unit_ids = set(semester_ids), set(subject_ids), set(unit_ids)
+
+        if semester_ids:
+            subject_ids |= {s["id"] for s in self.rows("subjects.json") if s["semesterId"] in semester_ids}
+            self.set_rows("semesters.json", [s for s in self.rows("semesters.json") if s["id"] not in semester_ids])
+        if subject_ids:
+            unit_ids |= {u["id"] for u in self.rows("units.json") if u["subjectId"] in subject_ids}
+            self.set_rows("subjects.json", [s for s in self.rows("subjects.json") if s["id"] not in subject_ids])
+        if unit_ids:
+            self.set_rows("units.json", [u for u in self.rows("units.json") if u["id"] not in unit_ids])
+            kept_pdfs = []
+            for pdf in self.rows("uploaded_pdfs.json"):
+                if pdf["unitId"] in unit_ids:
+                    if pdf.get("localPath"):
+                        self._cleanup_files.add(pdf["localPath"])
+                else:
+                    kept_pdfs.append(pdf)
+            self.set_rows("uploaded_pdfs.json", kept_pdfs)
+            self._cleanup_units |= unit_ids
+
+    def commit(self):
+        staged = []
+        try:
+            for filename, data in self._data.items():
+                staged.append((filename, *_write_temp(filename, data)))
+        except Exception:
+            for _, tmp_path, _ in staged:
+                os.remove(tmp_path)
+            raise
+
+        journal = {
+            "replace": [[tmp_path, filename] for filename, tmp_path, _ in staged],
+            "units": sorted(self._cleanup_units),
+            "files": sorted(self._cleanup_files),
+        }
+        journal_tmp, _ = _write_temp(_JOURNAL, journal)
+        os.replace(journal_tmp, _get_path(_JOURNAL))
+
+        for filename, tmp_path, signature in staged:
+            _install(filename, tmp_path, signature, self._data[filename])
+        _remove_unit_files(journal["units"], journal["files"])
+        os.remove(_get_path(_JOURNAL))
+
+@contextmanager
+def batch():
+    """
+    Run several mutations as one atomic commit:
+
+        with batch() as tx:
+            tx.delete_semester(semester_id)
+
+    Nothing is written if the block raises.
+    """
+    with FileLock(_get_path(_STORAGE_LOCK)):
+        _recover_journal()
+        tx = StorageBatch()
+        yield tx
+        tx.commit()
+
+def _recover_journal():
+    """Finish a batch commit interrupted by a crash. Caller holds the storage lock."""
+    path = _get_path(_JOURNAL)
+    if not os.path.exists(path):
+        return
+    with open(path, "r") as f:
+        journal = json.load(f)
+    for tmp_path, filename in journal["replace"]:
+        if os.path.exists(tmp_path):
+            os.replace(tmp_path, _get_path(filename))
+    _remove_unit_files(journal["units"], journal["files"])
+    os.remove(path)
+    print(f"[Storage] Recovered interrupted batch ({len(journal['replace'])} file(s)).")
+
+def recover_storage():
+    """Roll forward any interrupted batch. Called once at app startup."""
+    with FileLock(_get_path(_STORAGE_LOCK)):
+        _recover_journal()
+
+def _remove_unit_files(unit_ids, file_paths):
+    for unit_id in unit_ids:
+        delete_generated_notes(unit_id)
+    remove_unit_files(unit_ids, file_paths)
+
 # --- Semester Helpers ---
 def create_semester(name: str, order: int) -> dict:
-    data = _load_json("semesters.json")
     new_sem = {
         "id": str(uuid.uuid4()),
         "name": name,
         "order": order,
         "createdAt": datetime.now().isoformat()
     }
-    data.append(new_sem)
-    _save_json("semesters.json", data)
+    with batch() as tx:
+        tx.rows("semesters.json").append(new_sem)
     return new_sem
 
 def get_semesters() -> list:
@@ -53,22 +258,12 @@ def get_semesters() -> list:
     return sorted(data, key=lambda x: x.get("order", 0))
 
 def delete_semester(semester_id: str):
-    # 1. Load data
-    semesters = _load_json("semesters.json")
-    subjects = _load_json("subjects.json")
-    
-    # 2. Find and remove subjects related to this semester
-    subjects_to_delete = [s for s in subjects if s["semesterId"] == semester_id]
-    for subj in subjects_to_delete:
-        delete_subject(subj["id"])
-        
-    # 3. Remove the semester
-    semesters = [s for s in semesters if s["id"] != semester_id]
-    _save_json("semesters.json", semesters)
+    """Delete a semester with its subjects, units, PDFs and notes in one commit."""
+    with batch() as tx:
+        tx.delete_semester(semester_id)
 
 # --- Subject Helpers ---
 def create_subject(semester_id: str, name: str, code: str) -> dict:
-    data = _load_json("subjects.json")
     new_subj = {
         "id": str(uuid.uuid4()),
         "semesterId": semester_id,
@@ -76,34 +271,20 @@ def create_subject(semester_id: str, name: str, code: str) -> dict:
         "code": code,
         "createdAt": datetime.now().isoformat()
     }
-    data.append(new_subj)
-    _save_json("subjects.json", data)
+    with batch() as tx:
+        tx.rows("subjects.json").append(new_subj)
     return new_subj
 
 def get_subjects(semester_id: str) -> list:
-    data = _load_json("subjects.json")
-    return [s for s in data if s["semesterId"] == semester_id]
+    return _find("subjects.json", "semesterId", semester_id)
 
 def delete_subject(subject_id: str):
-    # 1. Load data
-    subjects = _load_json("subjects.json")
-    units = _load_json("units.json")
-    
-    # 2. Find and remove units related to this subject
-    units_to_delete = [u for u in units if u["subjectId"] == subject_id]
-    for unit in units_to_delete:
-        delete_unit(unit["id"])
-        
-    # 3. Reload units (since delete_unit modified the file)
-    units = _load_json("units.json")
-    
-    # 4. Remove the subject
-    subjects = [s for s in subjects if s["id"] != subject_id]
-    _save_json("subjects.json", subjects)
+    """Delete a subject with its units, PDFs and notes in one commit."""
+    with batch() as tx:
+        tx.delete_subject(subject_id)
 
 # --- Unit Helpers ---
 def create_unit(subject_id: str, unit_number: int, title: str) -> dict:
-    data = _load_json("units.json")
     new_unit = {
         "id": str(uuid.uuid4()),
         "subjectId": subject_id,
@@ -111,32 +292,24 @@ def create_unit(subject_id: str, unit_number: int, title: str) -> dict:
         "title": title,
         "createdAt": datetime.now().isoformat()
     }
-    data.append(new_unit)
-    _save_json("units.json", data)
+    with batch() as tx:
+        tx.rows("units.json").append(new_unit)
     return new_unit
 
 def get_units(subject_id: str) -> list:
-    data = _load_json("units.json")
-    return sorted([u for u in data if u["subjectId"] == subject_id], key=lambda x: x.get("unitNumber", 0))
+    units = _find("units.json", "subjectId", subject_id)
+    return sorted(units, key=lambda x: x.get("unitNumber", 0))
 
 def get_unit(unit_id: str) -> dict | None:
-    data = _load_json("units.json")
-    return _get_item_by_id(data, unit_id)
+    return _find_one("units.json", "id", unit_id)
 
 def delete_unit(unit_id: str):
-    # 1. Load units
-    units = _load_json("units.json")
-    
-    # 2. Delete generated notes first
-    delete_generated_notes(unit_id)
-    
-    # 3. Remove unit from data
-    units = [u for u in units if u["id"] != unit_id]
-    _save_json("units.json", units)
+    """Delete a unit with its PDFs and notes in one commit."""
+    with batch() as tx:
+        tx.delete_unit(unit_id)
 
 # --- PDF Helpers ---
 def save_pdf_metadata(unit_id: str, local_path: str, filename: str, uploaded_by: str) -> dict:
-    data = _load_json("uploaded_pdfs.json")
     new_pdf = {
         "id": str(uuid.uuid4()),
         "unitId": unit_id,
@@ -145,21 +318,20 @@ def save_pdf_metadata(unit_id: str, local_path: str, filename: str, uploaded_by:
         "uploadedBy": uploaded_by,
         "uploadedAt": datetime.now().isoformat()
     }
-    data.append(new_pdf)
-    _save_json("uploaded_pdfs.json", data)
+    with batch() as tx:
+        tx.rows("uploaded_pdfs.json").append(new_pdf)
     return new_pdf
 
 def get_pdfs_for_unit(unit_id: str) -> list:
-    data = _load_json("uploaded_pdfs.json")
-    return [p for p in data if p["unitId"] == unit_id]
+    return _find("uploaded_pdfs.json", "unitId", unit_id)
 
 def delete_pdf_metadata(pdf_id: str):
-    data = _load_json("uploaded_pdfs.json")
-    item = _get_item_by_id(data, pdf_id)
-    if item:
-        # Delete file too? For now just metadata
-        data.remove(item)
-        _save_json("uploaded_pdfs.json", data)
+    with batch() as tx:
+        data = tx.rows("uploaded_pdfs.json")
+        item = _get_item_by_id(data, pdf_id)
+        if item:
+            # Delete file too? For now just metadata
+            data.remove(item)
 
 # --- Notes Helpers ---
 def get_generated_notes(unit_id: str) -> dict | None:
@@ -182,55 +354,178 @@ def save_generated_notes(unit_id: str, notes: dict):
     os.makedirs(os.path.dirname(path), exist_ok=True)
     with open(path, "w") as f:
         json.dump(data, f, indent=2)
+    _bump_notes_version()
 
 def delete_generated_notes(unit_id: str):
-    path = os.path.join(config.NOTES_DIR, f"{unit_id}.json")
-    if os.path.exists(path):
-        os.remove(path)
+    remove_if_exists(os.path.join(config.NOTES_DIR, f"{unit_id}.json"))
+    _bump_notes_version()
+
+# Replaced (new inode and mtime) whenever a unit's notes file is written or
+# removed, so its signature tracks notes availability and nothing else in
+# NOTES_DIR (progress, pools, locks).
+_NOTES_VERSION = "notes_version"
+
+def _bump_notes_version():
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=config.DATA_DIR, prefix=f".{_NOTES_VERSION}.", suffix=".tmp")
+        os.close(fd)
+        os.replace(tmp_path, _get_path(_NOTES_VERSION))
+    except OSError as e:
+        print(f"[Storage] Could not bump the notes version: {e}")
+
+# --- Catalog ---
+def get_catalog_version(include_notes: bool = False) -> tuple:
+    """Opaque value that changes whenever the semester/subject/unit tree (and optionally notes availability) does."""
+    version = tuple(_file_signature(_get_path(f)) for f in ("semesters.json", "subjects.json", "units.json"))
+    if include_notes:
+        version += (_file_signature(_get_path(_NOTES_VERSION)),)
+    return version
+
+def get_units_with_notes() -> set:
+    """IDs of all units that currently have generated notes."""
+    if not os.path.isdir(config.NOTES_DIR):
+        return set()
+    return {
+        entry.name[:-len(".json")] for entry in os.scandir(config.NOTES_DIR)
+        if entry.name.endswith(".json") and entry.name.count(".") == 1
+    }
 
 # --- Student Progress ---
+# Progress updates are appended to a JSONL log instead of rewriting
+# student_progress.json on every click. When the log passes
+# config.PROGRESS_LOG_MAX_BYTES it is folded into the snapshot and replaced
+# with an empty file. Readers keep a per-uid index built from the snapshot
+# plus whatever log tail they haven't consumed yet.
+_PROGRESS_SNAPSHOT = "student_progress.json"
+_PROGRESS_LOG = "student_progress.log"
+_PROGRESS_LOCK = "student_progress.lock"
+
+_progress_index = {"snapshot": None, "log_ino": None, "offset": 0, "by_uid": {}}
+_progress_lock = threading.Lock()
+
 def save_unit_progress(uid: str, unit_id: str, status: str):
     """Save completion status ('read', 'learned') for a student + unit."""
-    data = _load_json("student_progress.json")
-    # key: f"{uid}_{unit_id}"
-    progress_id = f"{uid}_{unit_id}"
-    
-    found = False
-    for item in data:
-        if item["id"] == progress_id:
-            item["status"] = status
-            item["updatedAt"] = datetime.now().isoformat()
-            found = True
-            break
-            
-    if not found:
-        data.append({
-            "id": progress_id,
-            "uid": uid,
-            "unitId": unit_id,
-            "status": status,
-            "updatedAt": datetime.now().isoformat()
-        })
-        
-    _save_json("student_progress.json", data)
+    line = json.dumps({
+        "uid": uid,
+        "unitId": unit_id,
+        "status": status,
+        "updatedAt": datetime.now().isoformat()
+    }) + "\n"
+
+    with FileLock(_get_path(_PROGRESS_LOCK)):
+        with open(_get_path(_PROGRESS_LOG), "a") as f:
+            f.write(line)
+            log_size = f.tell()
+        if log_size >= config.PROGRESS_LOG_MAX_BYTES:
+            try:
+                _compact_progress_log()
+            except OSError as e:
+                # The update is already in the log; compaction is retried next time.
+                print(f"[Storage] Progress log compaction failed: {e}")
+
+def compact_progress_log():
+    """Fold the progress log into the snapshot now (e.g. from a scheduled job)."""
+    with FileLock(_get_path(_PROGRESS_LOCK)):
+        _compact_progress_log()
+
+def _compact_progress_log():
+    # Caller holds the progress lock. If we crash between the two replaces the
+    # old log is simply replayed over the new snapshot, which is idempotent.
+    log_path = _get_path(_PROGRESS_LOG)
+    if not os.path.exists(log_path):
+        return
+    rows = {row["id"]: row for row in _load_json(_PROGRESS_SNAPSHOT)}
+    with open(log_path, "r") as f:
+        for entry in _iter_log_entries(f.read()):
+            progress_id = f"{entry['uid']}_{entry['unitId']}"
+            rows[progress_id] = {"id": progress_id, **entry}
+    # Not _save_json: it swallows write errors, and the log must only be reset
+    # once the snapshot holding its entries is in place.
+    data = list(rows.values())
+    tmp_path, signature = _write_temp(_PROGRESS_SNAPSHOT, data)
+    _install(_PROGRESS_SNAPSHOT, tmp_path, signature, data)
+
+    # Swap in a fresh file (new inode) so readers notice the log was reset.
+    fd, tmp_path = tempfile.mkstemp(dir=config.DATA_DIR, prefix=f".{_PROGRESS_LOG}.", suffix=".tmp")
+    os.close(fd)
+    os.replace(tmp_path, log_path)
+    print(f"[Storage] Compacted progress log into {len(rows)} row(s).")
+
+def _iter_log_entries(text):
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            print("[Storage] Skipping corrupt progress log line.")
+
+def _refresh_progress_index():
+    """Bring the in-process progress index up to date. Caller holds _progress_lock."""
+    idx = _progress_index
+    for _ in range(3):
+        snapshot = _get_collection(_PROGRESS_SNAPSHOT)
+        log_path = _get_path(_PROGRESS_LOG)
+        try:
+            f = open(log_path, "rb")
+        except FileNotFoundError:
+            f = None
+        log_ino = os.fstat(f.fileno()).st_ino if f else None
+
+        if snapshot is not idx["snapshot"] or log_ino != idx["log_ino"]:
+            by_uid = {}
+            for row in snapshot["rows"]:
+                by_uid.setdefault(row["uid"], {})[row["unitId"]] = row["status"]
+            idx.update(snapshot=snapshot, log_ino=log_ino, offset=0, by_uid=by_uid)
+
+        if f:
+            with f:
+                f.seek(idx["offset"])
+                tail = f.read()
+            # Only consume whole lines; a concurrent append may be half-written.
+            complete = tail[:tail.rfind(b"\n") + 1]
+            for entry in _iter_log_entries(complete.decode("utf-8")):
+                idx["by_uid"].setdefault(entry["uid"], {})[entry["unitId"]] = entry["status"]
+            idx["offset"] += len(complete)
+
+        # A compaction between reading the snapshot and the log could hide
+        # entries; if the snapshot moved underneath us, rebuild.
+        if _get_collection(_PROGRESS_SNAPSHOT) is snapshot:
+            return
 
 def get_student_progress(uid: str) -> dict:
     """Get all unit progress for a student as a map: {unit_id: status}."""
-    data = _load_json("student_progress.json")
-    return {item["unitId"]: item["status"] for item in data if item["uid"] == uid}
+    with _progress_lock:
+        _refresh_progress_index()
+        return dict(_progress_index["by_uid"].get(uid, {}))
 
 # --- User Helpers ---
 def get_user(uid: str) -> dict | None:
-    data = _load_json("users.json")
-    return next((u for u in data if u["uid"] == uid), None)
+    return _find_one("users.json", "uid", uid)
 
 def create_or_update_user(uid: str, name: str, email: str, role: str = "student"):
-    data = _load_json("users.json")
-    user = next((u for u in data if u["uid"] == uid), None)
-    if user:
-        user["name"] = name
-        user["email"] = email
-        user["role"] = role
-    else:
-        data.append({"uid": uid, "name": name, "email": email, "role": role})
-    _save_json("users.json", data)
+    with batch() as tx:
+        data = tx.rows("users.json")
+        user = next((u for u in data if u["uid"] == uid), None)
+        if user:
+            user["name"] = name
+            user["email"] = email
+            user["role"] = role
+        else:
+            data.append({"uid": uid, "name": name, "email": email, "role": role})
+
+
+# --- Backend Selection ---
+# With STORAGE_BACKEND=sqlite the helpers above are replaced by the SQLite
+# implementation; callers keep importing from this module either way.
+if config.STORAGE_BACKEND == "sqlite":
+    from backend.services.sqlite_storage_service import (  # noqa: E402,F401
+        create_semester, get_semesters, delete_semester,
+        create_subject, get_subjects, delete_subject,
+        create_unit, get_units, get_unit, delete_unit,
+        save_pdf_metadata, get_pdfs_for_unit, delete_pdf_metadata,
+        get_generated_notes, save_generated_notes, delete_generated_notes,
+        get_catalog_version, get_units_with_notes,
+        save_unit_progress, get_student_progress,
+        get_user, create_or_update_user,
+    )
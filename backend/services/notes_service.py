@@ -7,63 +7,346 @@ Implements the Lazy AI Generation pattern:
   4. Store in local JSON permanently
 """
 import os
+import json
+import math
+import time
+import random
 import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from backend.config import config
 from backend.services import local_storage_service as storage
+from backend.services import rate_limit_service
+from backend.services.file_lock import FileLock
+from backend.services.summary_cache_service import get_summary, put_summary
+from backend.services.topic_cache_service import get_topic_notes, put_topic_notes
 from backend.services.pdf_service import extract_text_from_pdf, split_into_chunks
-from backend.services.gemini_service import summarize_chunk, generate_notes, generate_notes_from_topic, generate_quiz, generate_flashcards
+from backend.services.gemini_service import circuit_open, summarize_chunk, summarize_chunks_batch, generate_notes, generate_notes_from_topic, stream_notes_from_topic, generate_quiz, generate_flashcards, estimate_tokens
+
+# Shared by all requests in this process, so concurrent generations together
+# never run more than SUMMARY_CONCURRENCY Gemini summarize calls at once.
+_summary_pool = ThreadPoolExecutor(max_workers=config.SUMMARY_CONCURRENCY, thread_name_prefix="summarize")
 
 def generate_unit_flashcards(unit_id: str) -> dict:
     """
     Generate revision flashcards based on unit notes.
+    Served from the unit's flashcard pool once it holds FLASHCARD_VARIANTS sets.
     """
-    cached = storage.get_generated_notes(unit_id)
-    if not cached:
-        return {"status": "error", "message": "Please generate notes for this unit first."}
-
-    unit = storage.get_unit(unit_id)
-    unit_title = unit.get("title", "this unit") if unit else "this unit"
-    
-    flashcards = generate_flashcards(unit_title, str(cached))
-    
-    if not flashcards:
-        return {"status": "error", "message": "Failed to generate flashcards."}
-        
-    return {"status": "success", "flashcards": flashcards}
+    return _derived_from_notes(unit_id, "flashcards", config.FLASHCARD_VARIANTS,
+                               generate_flashcards, "Failed to generate flashcards.")
 
 def generate_unit_quiz(unit_id: str) -> dict:
     """
     Generate a quiz based on existing notes for a unit.
+    Served from the unit's quiz pool once it holds QUIZ_VARIANTS quizzes.
     """
-    cached = storage.get_generated_notes(unit_id)
-    if not cached:
+    return _derived_from_notes(unit_id, "quiz", config.QUIZ_VARIANTS,
+                               generate_quiz, "Failed to generate quiz questions.")
+
+def get_cached_flashcards(unit_id: str) -> dict | None:
+    """A stored flashcard set if there is one ("refill": True while the pool is filling), else None."""
+    return _derived_from_notes(unit_id, "flashcards", config.FLASHCARD_VARIANTS, None)
+
+def get_cached_quiz(unit_id: str) -> dict | None:
+    """A stored quiz if there is one ("refill": True while the pool is filling), else None."""
+    return _derived_from_notes(unit_id, "quiz", config.QUIZ_VARIANTS, None)
+
+
+# ── Compact notes for prompts ─────────────────────────────────────────────────
+# Sections in the order they are worth spending prompt tokens on, and how to
+# render one item of each as a single line.
+_PROMPT_SECTIONS = (
+    ("definitions", "DEFINITIONS", lambda d: f"{d.get('term', '')}: {d.get('definition', '')}"),
+    ("key_points", "KEY POINTS", str),
+    ("quick_revision", "QUICK REVISION", str),
+    ("important_questions", "IMPORTANT QUESTIONS", str),
+    ("short_notes", "SHORT NOTES", lambda n: f"{n.get('title', '')}: {n.get('content', '')}"),
+    ("long_answers", "LONG ANSWERS", lambda a: f"{a.get('question', '')} — {_clip_words(a.get('answer', ''), 80)}"),
+)
+
+
+def _clip_words(text: str, limit: int) -> str:
+    words = str(text).split()
+    return " ".join(words[:limit]) + (" …" if len(words) > limit else "")
+
+
+def compact_notes(notes: dict, max_tokens: int | None = None) -> tuple[str, int]:
+    """
+    Render notes as compact plain text for a prompt, filling at most
+    max_tokens (NOTES_PROMPT_TOKENS by default) in _PROMPT_SECTIONS order.
+    Returns (text, estimated token count).
+    """
+    if max_tokens is None:
+        max_tokens = config.NOTES_PROMPT_TOKENS
+
+    lines, used = [], 0
+    for key, heading, render in _PROMPT_SECTIONS:
+        items = notes.get(key) or []
+        if not isinstance(items, list):
+            items = [items]
+        section = []
+        for item in items:
+            try:
+                line = "- " + " ".join(render(item).split())
+            except AttributeError:  # item isn't the expected dict
+                line = "- " + " ".join(str(item).split())
+            cost = estimate_tokens(line) + 1
+            # The heading is only paid for along with the section's first line.
+            if not section:
+                cost += estimate_tokens(heading) + 1
+            if used + cost > max_tokens:
+                break
+            if not section:
+                section.append(heading)
+            section.append(line)
+            used += cost
+        lines.extend(section)
+
+    text = "\n".join(lines)
+    return text, estimate_tokens(text)
+
+
+# ── Quiz / flashcard pools ────────────────────────────────────────────────────
+# Stored next to the notes as "<unit_id>.<kind>.json":
+#   {"notesVersion": <notes generatedAt>, "variants": [[...], ...]}
+# A pool built from older notes is discarded, so regenerating notes
+# invalidates its quizzes and flashcards automatically.
+
+def _derived_path(unit_id: str, kind: str) -> str:
+    return os.path.join(config.NOTES_DIR, f"{unit_id}.{kind}.json")
+
+
+def _read_pool(path: str, version) -> tuple[list, list]:
+    """(variants built from the current notes, variants built from older notes)."""
+    try:
+        with open(path, "r") as f:
+            pool = json.load(f)
+    except (OSError, ValueError):
+        return [], []
+    if version is not None and pool.get("notesVersion") == version:
+        return pool.get("variants", []), []
+    return [], pool.get("variants", [])
+
+
+def _derived_from_notes(unit_id: str, kind: str, pool_size: int, generate, failure_message: str = None):
+    """
+    Result dict with a variant from the unit's pool under `kind`, generating a
+    new one with generate(unit_title, notes_str) while the pool has fewer than
+    pool_size. If generation fails, a variant built from older notes is
+    served with "stale": True. With generate=None nothing is generated: a
+    stored variant is returned with "refill": True while the pool isn't full
+    yet, and None if there is none (unless Gemini is down and an older
+    variant exists).
+    """
+    notes = storage.get_generated_notes(unit_id)
+    version = notes.get("generatedAt") if notes else None
+    pool_size = max(pool_size, 1)
+
+    path = _derived_path(unit_id, kind)
+    variants, stale = _read_pool(path, version)
+
+    if len(variants) >= pool_size:
+        return {"status": "success", kind: random.choice(variants)}
+    if generate is None:
+        if variants:
+            return {"status": "success", kind: random.choice(variants), "refill": True}
+        if circuit_open() and stale:
+            return _fallback_variant(kind, variants, stale)
+        return None
+    if not notes:
         return {"status": "error", "message": "Please generate notes for this unit first."}
 
     unit = storage.get_unit(unit_id)
     unit_title = unit.get("title", "this unit") if unit else "this unit"
 
-    # Notes content is a dict, we need to convert it to a string for the prompt
-    notes_str = str(cached) 
-    
-    quiz = generate_quiz(unit_title, notes_str)
-    
-    if not quiz:
-        return {"status": "error", "message": "Failed to generate quiz questions."}
-        
-    return {"status": "success", "quiz": quiz}
+    notes_str, tokens = compact_notes(notes)
+    print(f"[Notes] {kind} prompt carries ~{tokens} tokens of notes for unit {unit_id}")
+
+    try:
+        variant = generate(unit_title, notes_str)
+    except Exception as e:
+        print(f"[Notes] Error generating {kind} for unit {unit_id}: {e}")
+        variant = None
+    if not variant:
+        if variants or stale:
+            return _fallback_variant(kind, variants, stale)
+        return {"status": "error", "message": failure_message}
+
+    # Re-read under the lock: a job worker and the warm CLI may both be filling the pool.
+    with FileLock(f"{path}.lock"):
+        variants, _stale = _read_pool(path, version)
+        variants.append(variant)
+        fd, tmp_path = tempfile.mkstemp(dir=config.NOTES_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"notesVersion": version, "variants": variants[-pool_size:]}, f)
+        os.replace(tmp_path, path)
+    print(f"[Notes] Stored {kind} variant {min(len(variants), pool_size)}/{pool_size} for unit {unit_id}")
+    return {"status": "success", kind: variant}
+
+
+def _fallback_variant(kind: str, variants: list, stale: list) -> dict:
+    """A current variant if there is one, else one built from older notes."""
+    if variants:
+        return {"status": "success", kind: random.choice(variants)}
+    return {"status": "success", kind: random.choice(stale), "stale": True}
+
 
 def generate_topic_notes(topic: str) -> dict:
     """
     Generate notes based on a user-provided topic.
     """
+    cached = get_topic_notes(topic)
+    if cached:
+        return {"status": "cached", "notes": cached, "topic": topic}
+
     print(f"[Notes] Generating notes for topic: {topic}")
     try:
         notes = generate_notes_from_topic(topic)
+        put_topic_notes(topic, notes)
         return {"status": "generated", "notes": notes, "topic": topic}
     except Exception as e:
         print(f"[Notes] Error generating topic notes: {e}")
         return {"status": "error", "message": f"Failed to generate notes: {str(e)}"}
 
 
+def stream_topic_notes(topic: str):
+    """
+    Streaming variant of generate_topic_notes. Yields one event per finished
+    section ({"section", "data"}), then the same final dict generate_topic_notes
+    returns, or an error dict if generation fails part-way.
+    """
+    cached = get_topic_notes(topic)
+    if cached:
+        for section, value in cached.items():
+            yield {"section": section, "data": value}
+        yield {"status": "cached", "notes": cached, "topic": topic}
+        return
+
+    print(f"[Notes] Streaming notes for topic: {topic}")
+    notes = {}
+    try:
+        for section, value in stream_notes_from_topic(topic):
+            notes[section] = value
+            yield {"section": section, "data": value}
+    except Exception as e:
+        print(f"[Notes] Error streaming topic notes: {e}")
+        yield {"status": "error", "message": f"Failed to generate notes: {str(e)}"}
+        return
+    put_topic_notes(topic, notes)
+    yield {"status": "generated", "notes": notes, "topic": topic}
+
+
+def _summarize_chunks(chunks: list[str], on_done=None, budget: int | None = None) -> tuple[list[str], int]:
+    """
+    Summarize chunks on the shared pool; results keep the input order.
+    Chunks summarized before (same text, prompt and model) come from the cache;
+    the rest are packed into batched requests (see _pack_batches).
+    on_done(count) is called each time another chunk finishes.
+    Returns (summaries, requests made). Every batch gets its request; when a
+    batch fails, its chunks are retried one request each only while that
+    stays within budget. If no chunk could be summarized, the last error is
+    raised.
+    """
+    finished = [0]
+    finished_lock = threading.Lock()
+
+    def done(n=1):
+        if on_done:
+            with finished_lock:
+                for _ in range(n):
+                    finished[0] += 1
+                    on_done(finished[0])
+
+    results = [None] * len(chunks)
+    last_error = [None]
+    pending = []
+    for i, chunk in enumerate(chunks):
+        cached = get_summary(chunk)
+        if cached:
+            print(f"[Notes]   Chunk {i + 1}/{len(chunks)} from cache.")
+            results[i] = cached
+            done()
+        else:
+            pending.append(i)
+
+    def summarize_one(i):
+        try:
+            summary = summarize_chunk(chunks[i])
+            print(f"[Notes]   Chunk {i + 1}/{len(chunks)} summarized.")
+            # Blocked/empty responses come back as "Error: ..." text; don't keep those.
+            if summary and not summary.startswith("Error:"):
+                put_summary(chunks[i], summary)
+            return summary
+        except Exception as e:
+            print(f"[Notes]   Chunk {i + 1}/{len(chunks)} failed: {e}")
+            last_error[0] = e
+            return None
+        finally:
+            done()
+
+    def summarize_batch(batch):
+        if len(batch) > 1:
+            try:
+                summaries = summarize_chunks_batch([chunks[i] for i in batch])
+            except Exception as e:
+                print(f"[Notes]   Batch of {len(batch)} chunks failed: {e}")
+                last_error[0] = e
+                summaries = None
+            if summaries:
+                for i, summary in zip(batch, summaries):
+                    put_summary(chunks[i], summary, batched=True)
+                print(f"[Notes]   Chunks {', '.join(str(i + 1) for i in batch)}/{len(chunks)} summarized in one request.")
+                done(len(batch))
+                return summaries
+            if not spend(len(batch)):
+                print(f"[Notes]   Call budget spent; skipping {len(batch)} chunks of the failed batch.")
+                done(len(batch))
+                return [None] * len(batch)
+            print(f"[Notes]   Falling back to one request per chunk for {len(batch)} chunks.")
+        return [summarize_one(i) for i in batch]
+
+    batches = _pack_batches([chunks[i] for i in pending])
+    batches = [[pending[j] for j in batch] for batch in batches]
+    # The batches' own requests are always made; fallbacks draw on what's left.
+    fallbacks = [0]
+    fallbacks_lock = threading.Lock()
+
+    def spend(n):
+        with fallbacks_lock:
+            if budget is not None and len(batches) + fallbacks[0] + n > budget:
+                return False
+            fallbacks[0] += n
+            return True
+
+    work = rate_limit_service.propagate(summarize_batch)  # pool threads keep the caller's priority
+    for batch, summaries in zip(batches, _summary_pool.map(work, batches)):
+        for i, summary in zip(batch, summaries):
+            results[i] = summary
+    summaries = [summary for summary in results if summary]
+    if not summaries and last_error[0] is not None:
+        raise last_error[0]
+    return summaries, len(batches) + fallbacks[0]
+
+
+def _pack_batches(chunks: list[str]) -> list[list[int]]:
+    """
+    Group chunk indexes into requests of up to SUMMARY_BATCH_SIZE chunks and
+    SUMMARY_BATCH_TOKENS input tokens. A chunk over the token limit goes alone.
+    """
+    batches, current, size = [], [], 0
+    for i, chunk in enumerate(chunks):
+        cost = estimate_tokens(chunk)
+        if current and (len(current) >= config.SUMMARY_BATCH_SIZE
+                        or size + cost > config.SUMMARY_BATCH_TOKENS):
+            batches.append(current)
+            current, size = [], 0
+        current.append(i)
+        size += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
 def get_or_generate_notes(unit_id: str) -> dict:
     """
     Main entry point. Returns cached notes or generates new ones.
@@ -75,7 +358,231 @@ def get_or_generate_notes(unit_id: str) -> dict:
         return {"status": "cached", "notes": cached}
 
     print(f"[Notes] Cache MISS for unit {unit_id} — generating...")
+    return _single_flight(unit_id)
 
+
+def force_regenerate_notes(unit_id: str) -> dict:
+    """
+    Admin-only: regenerate notes from the PDFs. The current notes keep being
+    served until the new ones replace them, and stay if regeneration fails.
+    """
+    return _single_flight(unit_id, force=True)
+
+
+def invalidate_notes(unit_id: str):
+    """Drop a unit's notes so they regenerate, keeping a copy as the stale fallback."""
+    notes = storage.get_generated_notes(unit_id)
+    if notes:
+        fd, tmp_path = tempfile.mkstemp(dir=config.NOTES_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(notes, f)
+        os.replace(tmp_path, _stale_path(unit_id))
+    storage.delete_generated_notes(unit_id)
+
+
+def get_stale_notes(unit_id: str) -> dict | None:
+    """The unit's last notes from before it was invalidated, or None."""
+    try:
+        with open(_stale_path(unit_id), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _stale_path(unit_id: str) -> str:
+    return os.path.join(config.NOTES_DIR, f"{unit_id}.stale.json")
+
+
+def _with_stale_fallback(unit_id: str, result: dict) -> dict:
+    """Swap a failed generation for the unit's previous notes, flagged as stale."""
+    if result.get("status") != "error":
+        return result
+    stale = get_stale_notes(unit_id)
+    if not stale:
+        return result
+    print(f"[Notes] Serving stale notes for unit {unit_id}: {result.get('message')}")
+    return {"status": "stale", "stale": True, "notes": stale, "message": result.get("message")}
+
+
+# ── Single-flight ─────────────────────────────────────────────────────────────
+# One generation per unit across all gunicorn workers. The first request takes
+# "<unit_id>.lock" in NOTES_DIR and generates; the others block on the same
+# lock and then return whatever the leader produced — including its error, so
+# a failing unit isn't retried once per waiting student. A waiter lends the
+# leader its rate-limit priority, so a student isn't stuck behind batch warming.
+
+def _single_flight(unit_id: str, force: bool = False) -> dict:
+    lock = FileLock(os.path.join(config.NOTES_DIR, f"{unit_id}.lock"))
+    waited = False
+    if not lock.acquire(blocking=False):
+        waited = True
+        print(f"[Notes] Unit {unit_id} is already being generated — waiting for it...")
+        rate_limit_service.boost(f"notes:{unit_id}", config.NOTES_WAIT_TIMEOUT)
+        if not lock.acquire(timeout=config.NOTES_WAIT_TIMEOUT):
+            return {
+                "status": "pending",
+                "message": "Notes are still being generated. Please check back shortly.",
+                "retryAfter": 5,
+            }
+
+    try:
+        if waited or not force:
+            cached = storage.get_generated_notes(unit_id)
+            if cached:
+                return {"status": "cached", "notes": cached}
+        if waited:
+            failure = _recent_failure(unit_id)
+            if failure:
+                return _with_stale_fallback(unit_id, failure)
+
+        report_progress(unit_id, "started", reset=True)
+        try:
+            with rate_limit_service.task(f"notes:{unit_id}"):
+                result = _generate_unit_notes(unit_id)
+        except Exception as e:
+            print(f"[Notes] Error generating notes for unit {unit_id}: {e}")
+            result = {"status": "error", "message": f"Failed to generate notes: {str(e)}"}
+        _record_result(unit_id, result)
+        # A failed forced regeneration leaves the live notes in place.
+        final = result if storage.get_generated_notes(unit_id) else _with_stale_fallback(unit_id, result)
+        if result.get("status") == "error":
+            report_progress(unit_id, "error", message=result.get("message"), stale=bool(final.get("stale")))
+        return final
+    finally:
+        lock.release()
+
+
+# ── Progress ──────────────────────────────────────────────────────────────────
+# The generating worker writes its current stage to "<unit_id>.progress.json";
+# the SSE endpoint in any worker polls that file. Stages, in order:
+#   started → extracted (pdf i/N) → summarized (chunk i/N) → generating → saved
+# or "error" at any point. seq increases with every update of one run.
+
+_progress_seq = {}
+_progress_lock = threading.Lock()
+
+
+def _progress_path(unit_id: str) -> str:
+    return os.path.join(config.NOTES_DIR, f"{unit_id}.progress.json")
+
+
+def report_progress(unit_id: str, stage: str, reset: bool = False, **fields):
+    with _progress_lock:
+        seq = 1 if reset else _progress_seq.get(unit_id, 0) + 1
+        _progress_seq[unit_id] = seq
+        event = {"unitId": unit_id, "stage": stage, "seq": seq, "updatedAt": time.time(), **fields}
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=config.NOTES_DIR, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(event, f)
+            os.replace(tmp_path, _progress_path(unit_id))
+        except OSError as e:
+            print(f"[Notes] Could not write progress for unit {unit_id}: {e}")
+
+
+def get_progress(unit_id: str) -> dict | None:
+    """Latest progress event for the unit's current or last generation, or None."""
+    try:
+        with open(_progress_path(unit_id), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _failure_path(unit_id: str) -> str:
+    return os.path.join(config.NOTES_DIR, f"{unit_id}.error.json")
+
+
+def _record_result(unit_id: str, result: dict):
+    path = _failure_path(unit_id)
+    if result.get("status") == "error":
+        with open(path, "w") as f:
+            json.dump(result, f)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def _recent_failure(unit_id: str) -> dict | None:
+    """The leader's error result, if it failed within the last NOTES_WAIT_TIMEOUT seconds."""
+    path = _failure_path(unit_id)
+    try:
+        if time.time() - os.path.getmtime(path) > config.NOTES_WAIT_TIMEOUT:
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# ── Map-reduce ────────────────────────────────────────────────────────────────
+# Large units are covered in full at a bounded cost: chunk summaries are
+# grouped and summarized again, level by level, until the merged text fits
+# MERGED_NOTES_TOKENS. All levels together make at most SUMMARY_CALL_BUDGET
+# summarize requests (batched or not); when there are more pieces than
+# requests, adjacent pieces are joined rather than dropped.
+
+def _fit_to_count(pieces: list[str], max_count: int) -> list[str]:
+    """Join runs of adjacent pieces so that at most max_count remain."""
+    if len(pieces) <= max_count:
+        return pieces
+    per = math.ceil(len(pieces) / max_count)
+    return ["\n\n".join(pieces[i:i + per]) for i in range(0, len(pieces), per)]
+
+
+def _fit_to_calls(pieces: list[str], max_calls: int) -> list[str]:
+    """Like _fit_to_count, but counts batched requests rather than pieces."""
+    if len(_pack_batches(pieces)) <= max_calls:
+        return pieces
+    return _fit_to_count(pieces, max_calls)
+
+
+def _group_by_tokens(pieces: list[str], max_tokens: int) -> list[str]:
+    """Pack adjacent pieces into groups of about max_tokens each."""
+    groups, current, size = [], [], 0
+    for piece in pieces:
+        cost = estimate_tokens(piece)
+        if current and size + cost > max_tokens:
+            groups.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += cost
+    if current:
+        groups.append("\n\n".join(current))
+    return groups
+
+
+def _reduce_summaries(unit_id: str, summaries: list[str], calls_left: int) -> list[str]:
+    level = 0
+    while len(summaries) > 1 and estimate_tokens("\n\n".join(summaries)) > config.MERGED_NOTES_TOKENS:
+        if calls_left <= 0:
+            print(f"[Notes] Call budget spent; merged summaries still exceed {config.MERGED_NOTES_TOKENS} tokens")
+            break
+        level += 1
+        groups = _group_by_tokens(summaries, config.REDUCE_INPUT_TOKENS)
+        if len(groups) == len(summaries):
+            # Each summary is already past the group size; pair them up.
+            groups = _fit_to_count(summaries, math.ceil(len(summaries) / 2))
+        groups = _fit_to_calls(groups, calls_left)
+        print(f"[Notes] Reduce level {level}: {len(summaries)} summaries → {len(groups)} group(s)")
+        try:
+            reduced, calls = _summarize_chunks(
+                groups,
+                on_done=lambda n, total=len(groups), lvl=level: report_progress(
+                    unit_id, "reduced", level=lvl, done=n, total=total),
+                budget=calls_left,
+            )
+        except Exception as e:
+            print(f"[Notes] Reduce level {level} failed, keeping the previous level: {e}")
+            break
+        calls_left -= calls
+        if not reduced:
+            break
+        summaries = reduced
+    return summaries
+
+
+def _generate_unit_notes(unit_id: str) -> dict:
+    """Steps 2–6: extract, summarize and generate notes for one unit. Caller holds the unit lock."""
     # ── Step 2: Fetch unit info & PDFs ───────────────────────────────────────
     unit = storage.get_unit(unit_id)
     if not unit:
@@ -86,9 +593,9 @@ def get_or_generate_notes(unit_id: str) -> dict:
         return {"status": "error", "message": "No PDFs uploaded for this unit yet. Please upload study material first."}
 
     # ── Step 3: Extract + chunk text ─────────────────────────────────────────
-    all_summaries = []
+    all_chunks = []
 
-    for pdf_meta in pdfs:
+    for pdf_index, pdf_meta in enumerate(pdfs, 1):
         local_path = pdf_meta.get("localPath", "")
         if not local_path or not os.path.exists(local_path):
             print(f"[Notes] File not found: {local_path}")
@@ -100,36 +607,48 @@ def get_or_generate_notes(unit_id: str) -> dict:
             if not raw_text:
                 continue
 
-            # Chunk and summarize each chunk individually
             chunks = split_into_chunks(raw_text)
             print(f"[Notes] PDF '{pdf_meta.get('filename', 'unknown')}' → {len(chunks)} chunk(s)")
-
-            for i, chunk in enumerate(chunks):
-                summary = summarize_chunk(chunk)
-                all_summaries.append(summary)
-                print(f"[Notes]   Chunk {i + 1}/{len(chunks)} summarized.")
+            all_chunks.extend(chunks)
+            report_progress(unit_id, "extracted", done=pdf_index, total=len(pdfs),
+                            filename=pdf_meta.get("filename"))
 
         except Exception as e:
             print(f"[Notes] Error processing PDF {local_path}: {e}")
 
-    if not all_summaries:
+    if not all_chunks:
         return {"status": "error", "message": "Could not extract text from uploaded PDFs. Ensure PDFs contain selectable text."}
 
-    # ── Step 4: Merge all summaries ───────────────────────────────────────────
+    # ── Step 3b: Summarize all chunks concurrently, in their original order ──
+    # Keep some of the call budget back for the reduce passes in step 4.
+    leaf_budget = max(1, config.SUMMARY_CALL_BUDGET - config.SUMMARY_CALL_BUDGET // 8)
+    leaves = _fit_to_calls(all_chunks, leaf_budget)
+    if len(leaves) < len(all_chunks):
+        print(f"[Notes] {len(all_chunks)} chunks joined into {len(leaves)} to fit the call budget")
+    try:
+        all_summaries, calls = _summarize_chunks(
+            leaves,
+            on_done=lambda n: report_progress(unit_id, "summarized", done=n, total=len(leaves)),
+            budget=leaf_budget,
+        )
+    except Exception as e:
+        return {"status": "error", "message": f"Could not summarize the text extracted from the PDFs: {e}"}
+
+    if not all_summaries:
+        return {"status": "error", "message": "Could not summarize the text extracted from the PDFs."}
+
+    # ── Step 4: Reduce summaries until they fit generate_notes, then merge ───
+    all_summaries = _reduce_summaries(unit_id, all_summaries, config.SUMMARY_CALL_BUDGET - calls)
     merged = "\n\n".join(all_summaries)
 
     # ── Step 5: Generate final structured notes (ONE Gemini call) ─────────────
     unit_title = unit.get("title", "Unknown Unit")
+    report_progress(unit_id, "generating")
     notes = generate_notes(merged, unit_title)
 
     # ── Step 6: Store permanently in Local JSON ────────────────────────────────
     storage.save_generated_notes(unit_id, notes)
+    report_progress(unit_id, "saved")
     print(f"[Notes] ✓ Notes generated and cached for unit {unit_id}")
 
     return {"status": "generated", "notes": {**notes, "unitId": unit_id}}
-
-
-def force_regenerate_notes(unit_id: str) -> dict:
-    """Admin-only: Delete cached notes and regenerate."""
-    storage.delete_generated_notes(unit_id)
-    return get_or_generate_notes(unit_id)
@@ -1,14 +1,44 @@
 """
 NoteNexus — PDF Service
 Extracts and chunks text from PDFs using PyMuPDF (fitz).
+
+Extracted text is cached in EXTRACTED_TEXT_DIR as gzip files named by the
+PDF's content hash. index.json maps each source path to its (mtime, size,
+hash), so a PDF is only re-hashed when it changes on disk. Entries whose
+source changed or was removed are dropped by prune_extracted_text().
 """
 import os
+import gzip
+import json
+import hashlib
+import tempfile
 import fitz  # PyMuPDF
 from backend.config import config
+from backend.services.file_lock import FileLock
+
+# Bump when extraction changes; entries from older versions are never read.
+EXTRACTOR_VERSION = 1
+
+_INDEX = "index.json"
+_INDEX_LOCK = "index.lock"
 
 
 def extract_text_from_pdf(file_path: str) -> str:
-    """Extract all text from a PDF file. Returns empty string on failure."""
+    """Extract all text from a PDF file (cached by content). Returns empty string on failure."""
+    key = _content_key(file_path)
+    if key:
+        text = _read_cached_text(key)
+        if text is not None:
+            print(f"[PDF] Extracted text cache HIT for {os.path.basename(file_path)}")
+            return text
+
+    text = _extract_text(file_path)
+    if key and text:
+        _write_cached_text(key, text)
+    return text
+
+
+def _extract_text(file_path: str) -> str:
     try:
         doc = fitz.open(file_path)
         text_parts = []
@@ -21,6 +51,141 @@ def extract_text_from_pdf(file_path: str) -> str:
         return ""
 
 
+# ── Extracted text cache ──────────────────────────────────────────────────────
+
+def _cache_path(name: str) -> str:
+    return os.path.join(config.EXTRACTED_TEXT_DIR, name)
+
+
+def _load_index() -> dict:
+    try:
+        with open(_cache_path(_INDEX), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_index(index: dict):
+    fd, tmp_path = tempfile.mkstemp(dir=config.EXTRACTED_TEXT_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, _cache_path(_INDEX))
+    except OSError:
+        _discard(tmp_path)
+        raise
+
+
+def _discard(tmp_path: str):
+    try:
+        os.remove(tmp_path)
+    except OSError:
+        pass
+
+
+def _hash_file(file_path: str) -> str:
+    h = hashlib.sha256(f"v{EXTRACTOR_VERSION}\0".encode("utf-8"))
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _content_key(file_path: str) -> str | None:
+    """Content hash of the PDF, re-computed only when its mtime/size change."""
+    path = os.path.abspath(file_path)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    stamp = [st.st_mtime_ns, st.st_size]
+
+    entry = _load_index().get(path)
+    if entry and entry[:2] == stamp:
+        return entry[2]
+
+    try:
+        key = _hash_file(path)
+    except OSError as e:
+        print(f"[PDF] Could not hash {file_path}: {e}")
+        return None
+    # The cache is an optimisation: if it can't be written (full disk,
+    # read-only dir) the key is still good and extraction goes ahead.
+    try:
+        os.makedirs(config.EXTRACTED_TEXT_DIR, exist_ok=True)
+        with FileLock(_cache_path(_INDEX_LOCK)):
+            index = _load_index()
+            old = index.get(path)
+            index[path] = stamp + [key]
+            _save_index(index)
+            if old and old[2] != key:
+                _remove_unreferenced(index, [old[2]])
+    except OSError as e:
+        print(f"[PDF] Could not update the extracted text index: {e}")
+    return key
+
+
+def _read_cached_text(key: str) -> str | None:
+    try:
+        with gzip.open(_cache_path(f"{key}.txt.gz"), "rt", encoding="utf-8") as f:
+            return f.read()
+    except (OSError, EOFError):
+        return None
+
+
+def _write_cached_text(key: str, text: str):
+    tmp_path = None
+    try:
+        os.makedirs(config.EXTRACTED_TEXT_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=config.EXTRACTED_TEXT_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, _cache_path(f"{key}.txt.gz"))
+    except OSError as e:
+        print(f"[PDF] Could not cache extracted text: {e}")
+        if tmp_path:
+            _discard(tmp_path)
+
+
+def _remove_unreferenced(index: dict, keys) -> int:
+    """Delete cached text for keys no longer used by any indexed PDF. Caller holds the index lock."""
+    live = {entry[2] for entry in index.values()}
+    removed = 0
+    for key in set(keys) - live:
+        try:
+            os.remove(_cache_path(f"{key}.txt.gz"))
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def prune_extracted_text() -> int:
+    """
+    Drop cached text whose source PDF was removed or changed since it was
+    extracted, plus any orphaned cache files. Returns the number of files deleted.
+    """
+    if not os.path.isdir(config.EXTRACTED_TEXT_DIR):
+        return 0
+    with FileLock(_cache_path(_INDEX_LOCK)):
+        index = _load_index()
+        for path, (mtime_ns, size, _key) in list(index.items()):
+            try:
+                st = os.stat(path)
+                if [st.st_mtime_ns, st.st_size] == [mtime_ns, size]:
+                    continue
+            except OSError:
+                pass
+            del index[path]
+        _save_index(index)
+        cached = [name[:-len(".txt.gz")] for name in os.listdir(config.EXTRACTED_TEXT_DIR)
+                  if name.endswith(".txt.gz")]
+        removed = _remove_unreferenced(index, cached)
+    if removed:
+        print(f"[PDF] Pruned {removed} stale extracted text file(s).")
+    return removed
+
+
 def split_into_chunks(text: str, chunk_size: int = None) -> list[str]:
     """Split text into chunks of ~chunk_size characters (split on word boundaries)."""
     if chunk_size is None:
@@ -44,8 +209,8 @@ def split_into_chunks(text: str, chunk_size: int = None) -> list[str]:
     if current_chunk:
         chunks.append(" ".join(current_chunk))
 
-    # Limit chunks to avoid excessive API calls
-    return chunks[:config.MAX_CHUNKS]
+    # Every chunk is kept; notes_service bounds the API calls spent on them.
+    return chunks
 
 
 def cleanup_file(file_path: str):
@@ -0,0 +1,280 @@
+"""
+NoteNexus — Gemini Rate Limiter
+Token buckets for requests per minute (GEMINI_RPM) and input tokens per
+minute (GEMINI_TPM), kept in a SQLite file so every gunicorn worker and job
+thread draws from the same quota. When Gemini answers 429 with a retry delay,
+backoff() pauses all callers until then instead of each worker finding out
+on its own.
+
+Callers run at a priority: INTERACTIVE (a student is waiting), NORMAL
+(admin regeneration, quiz/flashcard pool refills), or BATCH (the cache
+warmer). Waiting callers are registered in the `waiters` table, and nobody
+takes quota while a more urgent caller waits anywhere. BATCH calls also
+leave PRIORITY_RESERVE requests in the bucket for a student who may arrive
+next. A 429 on a less urgent call pauses only that class and the ones below
+it, so background work never pushes a student into backoff. A waiter's
+priority rises one class every PRIORITY_AGING_SECONDS it waits, so batch
+work can't starve.
+"""
+import os
+import time
+import random
+import sqlite3
+import threading
+import contextlib
+import contextvars
+from backend.config import config
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name    TEXT PRIMARY KEY,
+    tokens  REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pauses (
+    priority INTEGER PRIMARY KEY,       -- applies to callers at this priority
+    until    REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS waiters (
+    id       TEXT PRIMARY KEY,          -- pid:thread
+    priority INTEGER NOT NULL,
+    since    REAL NOT NULL,
+    seen     REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS boosts (
+    task     TEXT PRIMARY KEY,
+    priority INTEGER NOT NULL,
+    until    REAL NOT NULL
+);
+"""
+
+INTERACTIVE, NORMAL, BATCH = 0, 1, 2
+PRIORITIES = (INTERACTIVE, NORMAL, BATCH)
+
+# A waiter not seen for this long belonged to a dead process.
+_WAITER_TTL = 30.0
+
+_local = threading.local()
+_priority = contextvars.ContextVar("llm_priority", default=NORMAL)
+_task = contextvars.ContextVar("llm_task", default=None)
+
+
+class RateLimitTimeout(RuntimeError):
+    """No quota became available within RATE_LIMIT_MAX_WAIT seconds."""
+
+
+# ── Priority context ──────────────────────────────────────────────────────────
+
+@contextlib.contextmanager
+def priority(level: int):
+    """Gemini calls made inside the block (in this thread) wait at `level`."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+@contextlib.contextmanager
+def task(key: str):
+    """Name the work done inside the block so boost(key) can speed it up."""
+    token = _task.set(key)
+    try:
+        yield
+    finally:
+        _task.reset(token)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+def propagate(fn):
+    """fn wrapped to run at the calling thread's priority and task, for thread pools."""
+    level, key = _priority.get(), _task.get()
+
+    def run(*args, **kwargs):
+        with priority(level), task(key):
+            return fn(*args, **kwargs)
+    return run
+
+
+def boost(key: str, seconds: float):
+    """
+    Let the work running under task(key) borrow the caller's priority for
+    `seconds` — e.g. a student waiting on a unit that warming is generating.
+    """
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("SELECT priority, until FROM boosts WHERE task = ?", (key,)).fetchone()
+        now = time.time()
+        level = current_priority()
+        if row and row[1] > now:
+            level = min(level, row[0])
+        conn.execute("INSERT OR REPLACE INTO boosts (task, priority, until) VALUES (?, ?, ?)",
+                     (key, level, max(now + seconds, row[1] if row else 0)))
+        conn.execute("DELETE FROM boosts WHERE until < ?", (now,))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _connect() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(config.RATE_LIMIT_PATH), exist_ok=True)
+        conn = sqlite3.connect(config.RATE_LIMIT_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.executescript(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def _limits() -> dict:
+    """
+    name -> (capacity, refill per second). Capacity is a small burst and the
+    refill rate is the rest of the quota, so no 60-second window can exceed it.
+    """
+    burst = max(1, min(config.GEMINI_BURST, config.GEMINI_RPM - 1))
+    token_burst = config.GEMINI_TPM // 6
+    return {
+        "requests": (burst, max(config.GEMINI_RPM - burst, 1) / 60.0),
+        "tokens": (token_burst, (config.GEMINI_TPM - token_burst) / 60.0),
+    }
+
+
+def _refill(conn: sqlite3.Connection, now: float) -> dict:
+    """Current level of every bucket, refilled up to now. Caller holds the write lock."""
+    levels = {}
+    for name, (capacity, rate) in _limits().items():
+        row = conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+        level = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+        levels[name] = level
+    return levels
+
+
+def _store(conn: sqlite3.Connection, levels: dict, now: float):
+    conn.executemany(
+        "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+        [(name, level, now) for name, level in levels.items()],
+    )
+
+
+def _effective(level: int, since: float, now: float) -> int:
+    """level raised one class per PRIORITY_AGING_SECONDS spent waiting."""
+    aged = int((now - since) // config.PRIORITY_AGING_SECONDS) if config.PRIORITY_AGING_SECONDS > 0 else 0
+    return max(INTERACTIVE, level - aged)
+
+
+def _own_priority(conn: sqlite3.Connection, now: float) -> int:
+    """The caller's priority, raised by a live boost of its task."""
+    level, key = current_priority(), _task.get()
+    if key:
+        row = conn.execute("SELECT priority FROM boosts WHERE task = ? AND until > ?", (key, now)).fetchone()
+        if row:
+            level = min(level, row[0])
+    return level
+
+
+def acquire(tokens: int):
+    """
+    Block until one request carrying `tokens` input tokens fits the shared
+    quota and no more urgent caller is waiting, then take it. Raises
+    RateLimitTimeout after RATE_LIMIT_MAX_WAIT (RATE_LIMIT_BATCH_MAX_WAIT for
+    BATCH callers).
+    """
+    limits = _limits()
+    need = {"requests": 1, "tokens": min(tokens, limits["tokens"][0])}
+    reserve = max(0, min(config.PRIORITY_RESERVE, limits["requests"][0] - 1))
+    max_wait = config.RATE_LIMIT_BATCH_MAX_WAIT if current_priority() >= BATCH else config.RATE_LIMIT_MAX_WAIT
+    deadline = time.monotonic() + max_wait
+    waiter = f"{os.getpid()}:{threading.get_ident()}"
+    since = time.time()
+    conn = _connect()
+    try:
+        while True:
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                base = _own_priority(conn, now)
+                level = _effective(base, since, now)
+                conn.execute(
+                    "INSERT OR REPLACE INTO waiters (id, priority, since, seen) VALUES (?, ?, ?, ?)",
+                    (waiter, base, since, now),
+                )
+                conn.execute("DELETE FROM waiters WHERE seen < ?", (now - _WAITER_TTL,))
+                ahead = any(
+                    _effective(other, other_since, now) < level
+                    for other, other_since in conn.execute(
+                        "SELECT priority, since FROM waiters WHERE id != ?", (waiter,))
+                )
+                levels = _refill(conn, now)
+                row = conn.execute("SELECT until FROM pauses WHERE priority = ?", (base,)).fetchone()
+                wait = max(0.0, row[0] - now) if row else 0.0
+                for name, amount in need.items():
+                    if name == "requests" and level >= BATCH:
+                        amount += reserve  # leave room for a student arriving next
+                    if levels[name] < amount:
+                        wait = max(wait, (amount - levels[name]) / limits[name][1])
+                if ahead:
+                    wait = max(wait, 0.5)  # a more urgent caller goes first
+                if wait <= 0:
+                    for name, amount in need.items():
+                        levels[name] -= amount
+                _store(conn, levels, now)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            if wait <= 0:
+                return
+
+            if time.monotonic() + wait > deadline:
+                raise RateLimitTimeout(f"Gemini quota unavailable for {max_wait}s")
+            # Jitter so waiting workers don't all wake up and race for the same slot.
+            time.sleep(min(wait, 5.0) * random.uniform(1.0, 1.25))
+    finally:
+        conn.execute("DELETE FROM waiters WHERE id = ?", (waiter,))
+
+
+def record_usage(estimated: int, actual: int | None):
+    """Charge (or refund) the difference once Gemini reports the real input token count."""
+    if not actual or actual == estimated:
+        return
+    capacity, _rate = _limits()["tokens"]
+    conn = _connect()
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        levels = _refill(conn, now)
+        levels["tokens"] = max(-capacity, min(capacity, levels["tokens"] - (actual - estimated)))
+        _store(conn, levels, now)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def backoff(delay: float):
+    """
+    Pause callers for `delay` seconds (e.g. the server's retry delay after a
+    429): those at the caller's priority and every less urgent one.
+    """
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        now = time.time()
+        until = now + delay
+        level = _own_priority(conn, now)
+        for affected in PRIORITIES[level:]:
+            row = conn.execute("SELECT until FROM pauses WHERE priority = ?", (affected,)).fetchone()
+            if row is None or row[0] < until:
+                conn.execute("INSERT OR REPLACE INTO pauses (priority, until) VALUES (?, ?)", (affected, until))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    print(f"[RateLimit] Gemini calls at priority {level}+ paused for {delay:.1f}s")
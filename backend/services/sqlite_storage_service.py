@@ -0,0 +1,462 @@
+"""
+NoteNexus — SQLite Storage Service
+Drop-in replacement for the JSON collections in local_storage_service.
+Enabled with STORAGE_BACKEND=sqlite; local_storage_service re-exports these
+functions so routes and services don't change.
+
+Writes are single-row statements instead of full-file rewrites, and WAL mode
+lets gunicorn workers read while another one writes.
+"""
+import os
+import json
+import uuid
+import sqlite3
+import threading
+from datetime import datetime
+from backend.config import config
+from backend.services.unit_files import remove_unit_files
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS semesters (
+    id         TEXT PRIMARY KEY,
+    name       TEXT NOT NULL,
+    sort_order INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS subjects (
+    id          TEXT PRIMARY KEY,
+    semester_id TEXT NOT NULL,
+    name        TEXT NOT NULL,
+    code        TEXT,
+    created_at  TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_subjects_semester ON subjects(semester_id);
+CREATE TABLE IF NOT EXISTS units (
+    id          TEXT PRIMARY KEY,
+    subject_id  TEXT NOT NULL,
+    unit_number INTEGER NOT NULL DEFAULT 0,
+    title       TEXT NOT NULL,
+    created_at  TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_units_subject ON units(subject_id, unit_number);
+CREATE TABLE IF NOT EXISTS uploaded_pdfs (
+    id          TEXT PRIMARY KEY,
+    unit_id     TEXT NOT NULL,
+    local_path  TEXT,
+    filename    TEXT,
+    uploaded_by TEXT,
+    uploaded_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_pdfs_unit ON uploaded_pdfs(unit_id);
+CREATE TABLE IF NOT EXISTS generated_notes (
+    unit_id      TEXT PRIMARY KEY,
+    data         TEXT NOT NULL,
+    generated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS student_progress (
+    uid        TEXT NOT NULL,
+    unit_id    TEXT NOT NULL,
+    status     TEXT NOT NULL,
+    updated_at TEXT,
+    PRIMARY KEY (uid, unit_id)
+);
+CREATE TABLE IF NOT EXISTS users (
+    uid   TEXT PRIMARY KEY,
+    name  TEXT,
+    email TEXT,
+    role  TEXT NOT NULL DEFAULT 'student'
+);
+
+-- Version counters bumped by triggers, used to invalidate the catalog cache
+INSERT OR IGNORE INTO meta (key, value) VALUES ('catalog_version', 0);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('notes_version', 0);
+CREATE TRIGGER IF NOT EXISTS trg_semesters_insert AFTER INSERT ON semesters
+BEGIN UPDATE meta SET value = value + 1 WHERE key = 'catalog_version'; END;
+CREATE TRIGGER IF NOT EXISTS trg_semesters_update AFTER UPDATE ON semesters
+BEGIN UPDATE meta SET value = value + 1 WHERE key = 'catalog_version'; END;
+CREATE TRIGGER IF NOT EXISTS trg_semesters_delete AFTER DELETE ON semesters
+BEGIN UPDATE meta SET value = value + 1 WHERE key = 'catalog_version'; END;
+CREATE TRIGGER IF NOT EXISTS trg_subjects_insert AFTER INSERT ON subjects
+BEGIN UPDATE meta SET value = value + 1 WHERE key = 'catalog_version'; END;
+CREATE TRIGGER IF NOT EXISTS trg_subjects_update AFTER UPDATE ON subjects
+BEGIN UPDATE meta SET value = value + 1 WHERE key = 'catalog_version'; END;
+CREATE TRIGGER IF NOT EXISTS trg_subjects_delete AFTER DELETE ON subjects
+BEGIN UPDATE meta SET value = value + 1 WHERE key = 'catalog_version'; END;
+CREATE TRIGGER IF NOT EXISTS trg_units_insert AFTER INSERT ON units
+BEGIN UPDATE meta SET value = value + 1 WHERE key = 'catalog_version'; END;
+CREATE TRIGGER IF NOT EXISTS trg_units_update AFTER UPDATE ON units
+BEGIN UPDATE meta SET value = value + 1 WHERE key = 'catalog_version'; END;
+CREATE TRIGGER IF NOT EXISTS trg_units_delete AFTER DELETE ON units
+BEGIN UPDATE meta SET value = value + 1 WHERE key = 'catalog_version'; END;
+CREATE TRIGGER IF NOT EXISTS trg_generated_notes_insert AFTER INSERT ON generated_notes
+BEGIN UPDATE meta SET value = value + 1 WHERE key = 'notes_version'; END;
+CREATE TRIGGER IF NOT EXISTS trg_generated_notes_update AFTER UPDATE ON generated_notes
+BEGIN UPDATE meta SET value = value + 1 WHERE key = 'notes_version'; END;
+CREATE TRIGGER IF NOT EXISTS trg_generated_notes_delete AFTER DELETE ON generated_notes
+BEGIN UPDATE meta SET value = value + 1 WHERE key = 'notes_version'; END;
+"""
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = False
+
+
+def _connect() -> sqlite3.Connection:
+    """Return this thread's connection, creating the schema on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        return conn
+
+    os.makedirs(os.path.dirname(config.SQLITE_PATH), exist_ok=True)
+    # isolation_level=None: autocommit, transactions are opened explicitly.
+    conn = sqlite3.connect(config.SQLITE_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    _local.conn = conn
+    _init_db(conn)
+    return conn
+
+
+def _init_db(conn: sqlite3.Connection):
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return
+        conn.executescript(_SCHEMA)
+        _migrate_from_json(conn)
+        _initialized = True
+
+
+class _transaction:
+    """BEGIN IMMEDIATE ... COMMIT, rolled back on error."""
+
+    def __init__(self):
+        self.conn = _connect()
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        return False
+
+
+# --- One-shot JSON import ---
+def _read_json_file(path):
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"[SQLite] Could not read {path} for migration: {e}")
+        return []
+
+
+def _read_progress_log():
+    """Entries of the JSON backend's student_progress.log, oldest first."""
+    path = os.path.join(config.DATA_DIR, "student_progress.log")
+    if not os.path.exists(path):
+        return []
+    entries = []
+    with open(path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                print("[SQLite] Skipping corrupt progress log line during migration.")
+    return entries
+
+
+def _migrate_from_json(conn: sqlite3.Connection):
+    """Import the existing JSON files once. Safe to race between workers."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        done = conn.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+        if done:
+            conn.execute("COMMIT")
+            return
+
+        def data_file(name):
+            return _read_json_file(os.path.join(config.DATA_DIR, name))
+
+        conn.executemany(
+            "INSERT OR IGNORE INTO semesters (id, name, sort_order, created_at) VALUES (?, ?, ?, ?)",
+            [(s["id"], s.get("name", ""), s.get("order", 0), s.get("createdAt")) for s in data_file("semesters.json")],
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO subjects (id, semester_id, name, code, created_at) VALUES (?, ?, ?, ?, ?)",
+            [(s["id"], s["semesterId"], s.get("name", ""), s.get("code", ""), s.get("createdAt"))
+             for s in data_file("subjects.json")],
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO units (id, subject_id, unit_number, title, created_at) VALUES (?, ?, ?, ?, ?)",
+            [(u["id"], u["subjectId"], u.get("unitNumber", 0), u.get("title", ""), u.get("createdAt"))
+             for u in data_file("units.json")],
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO uploaded_pdfs (id, unit_id, local_path, filename, uploaded_by, uploaded_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(p["id"], p["unitId"], p.get("localPath"), p.get("filename"), p.get("uploadedBy"), p.get("uploadedAt"))
+             for p in data_file("uploaded_pdfs.json")],
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO student_progress (uid, unit_id, status, updated_at) VALUES (?, ?, ?, ?)",
+            [(p["uid"], p["unitId"], p["status"], p.get("updatedAt")) for p in data_file("student_progress.json")],
+        )
+        # Updates not yet compacted into the snapshot; later lines win.
+        conn.executemany(
+            "INSERT OR REPLACE INTO student_progress (uid, unit_id, status, updated_at) VALUES (?, ?, ?, ?)",
+            [(p["uid"], p["unitId"], p["status"], p.get("updatedAt")) for p in _read_progress_log()],
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO users (uid, name, email, role) VALUES (?, ?, ?, ?)",
+            [(u["uid"], u.get("name"), u.get("email"), u.get("role", "student")) for u in data_file("users.json")],
+        )
+
+        notes_rows = []
+        if os.path.isdir(config.NOTES_DIR):
+            for entry in os.scandir(config.NOTES_DIR):
+                # Only "<unit_id>.json" files are notes.
+                if not entry.name.endswith(".json") or entry.name.count(".") != 1:
+                    continue
+                notes = _read_json_file(entry.path)
+                if isinstance(notes, dict) and notes:
+                    unit_id = notes.get("unitId") or entry.name[:-5]
+                    notes_rows.append((unit_id, json.dumps(notes), notes.get("generatedAt")))
+        conn.executemany(
+            "INSERT OR IGNORE INTO generated_notes (unit_id, data, generated_at) VALUES (?, ?, ?)",
+            notes_rows,
+        )
+
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('json_migrated', ?)",
+            (datetime.now().isoformat(),),
+        )
+        conn.execute("COMMIT")
+        print("[SQLite] ✓ Imported existing JSON data.")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+# --- Row mappers (keep the JSON backend's field names) ---
+def _semester(row) -> dict:
+    return {"id": row["id"], "name": row["name"], "order": row["sort_order"], "createdAt": row["created_at"]}
+
+def _subject(row) -> dict:
+    return {"id": row["id"], "semesterId": row["semester_id"], "name": row["name"],
+            "code": row["code"], "createdAt": row["created_at"]}
+
+def _unit(row) -> dict:
+    return {"id": row["id"], "subjectId": row["subject_id"], "unitNumber": row["unit_number"],
+            "title": row["title"], "createdAt": row["created_at"]}
+
+def _pdf(row) -> dict:
+    return {"id": row["id"], "unitId": row["unit_id"], "localPath": row["local_path"],
+            "filename": row["filename"], "uploadedBy": row["uploaded_by"], "uploadedAt": row["uploaded_at"]}
+
+def _user(row) -> dict:
+    return {"uid": row["uid"], "name": row["name"], "email": row["email"], "role": row["role"]}
+
+
+# --- Semester Helpers ---
+def create_semester(name: str, order: int) -> dict:
+    new_sem = {
+        "id": str(uuid.uuid4()),
+        "name": name,
+        "order": order,
+        "createdAt": datetime.now().isoformat()
+    }
+    _connect().execute(
+        "INSERT INTO semesters (id, name, sort_order, created_at) VALUES (?, ?, ?, ?)",
+        (new_sem["id"], name, order, new_sem["createdAt"]),
+    )
+    return new_sem
+
+def get_semesters() -> list:
+    rows = _connect().execute("SELECT * FROM semesters ORDER BY sort_order, rowid").fetchall()
+    return [_semester(r) for r in rows]
+
+def delete_semester(semester_id: str):
+    with _transaction() as conn:
+        unit_ids = [r["id"] for r in conn.execute(
+            "SELECT units.id FROM units JOIN subjects ON units.subject_id = subjects.id "
+            "WHERE subjects.semester_id = ?", (semester_id,))]
+        pdf_paths = _delete_units(conn, unit_ids)
+        conn.execute("DELETE FROM subjects WHERE semester_id = ?", (semester_id,))
+        conn.execute("DELETE FROM semesters WHERE id = ?", (semester_id,))
+    remove_unit_files(unit_ids, pdf_paths)
+
+# --- Subject Helpers ---
+def create_subject(semester_id: str, name: str, code: str) -> dict:
+    new_subj = {
+        "id": str(uuid.uuid4()),
+        "semesterId": semester_id,
+        "name": name,
+        "code": code,
+        "createdAt": datetime.now().isoformat()
+    }
+    _connect().execute(
+        "INSERT INTO subjects (id, semester_id, name, code, created_at) VALUES (?, ?, ?, ?, ?)",
+        (new_subj["id"], semester_id, name, code, new_subj["createdAt"]),
+    )
+    return new_subj
+
+def get_subjects(semester_id: str) -> list:
+    rows = _connect().execute(
+        "SELECT * FROM subjects WHERE semester_id = ? ORDER BY rowid", (semester_id,)
+    ).fetchall()
+    return [_subject(r) for r in rows]
+
+def delete_subject(subject_id: str):
+    with _transaction() as conn:
+        unit_ids = [r["id"] for r in conn.execute("SELECT id FROM units WHERE subject_id = ?", (subject_id,))]
+        pdf_paths = _delete_units(conn, unit_ids)
+        conn.execute("DELETE FROM subjects WHERE id = ?", (subject_id,))
+    remove_unit_files(unit_ids, pdf_paths)
+
+# --- Unit Helpers ---
+def create_unit(subject_id: str, unit_number: int, title: str) -> dict:
+    new_unit = {
+        "id": str(uuid.uuid4()),
+        "subjectId": subject_id,
+        "unitNumber": unit_number,
+        "title": title,
+        "createdAt": datetime.now().isoformat()
+    }
+    _connect().execute(
+        "INSERT INTO units (id, subject_id, unit_number, title, created_at) VALUES (?, ?, ?, ?, ?)",
+        (new_unit["id"], subject_id, unit_number, title, new_unit["createdAt"]),
+    )
+    return new_unit
+
+def get_units(subject_id: str) -> list:
+    rows = _connect().execute(
+        "SELECT * FROM units WHERE subject_id = ? ORDER BY unit_number, rowid", (subject_id,)
+    ).fetchall()
+    return [_unit(r) for r in rows]
+
+def get_unit(unit_id: str) -> dict | None:
+    row = _connect().execute("SELECT * FROM units WHERE id = ?", (unit_id,)).fetchone()
+    return _unit(row) if row else None
+
+def delete_unit(unit_id: str):
+    with _transaction() as conn:
+        pdf_paths = _delete_units(conn, [unit_id])
+    remove_unit_files([unit_id], pdf_paths)
+
+def _delete_units(conn: sqlite3.Connection, unit_ids: list) -> list:
+    """
+    Remove units with their notes and PDF rows inside an open transaction.
+    Returns the PDF paths to delete once the transaction has committed.
+    """
+    pdf_paths = []
+    for unit_id in unit_ids:
+        pdf_paths += [r["local_path"] for r in conn.execute(
+            "SELECT local_path FROM uploaded_pdfs WHERE unit_id = ? AND local_path IS NOT NULL", (unit_id,))]
+        conn.execute("DELETE FROM uploaded_pdfs WHERE unit_id = ?", (unit_id,))
+        conn.execute("DELETE FROM generated_notes WHERE unit_id = ?", (unit_id,))
+        conn.execute("DELETE FROM units WHERE id = ?", (unit_id,))
+    return pdf_paths
+
+# --- PDF Helpers ---
+def save_pdf_metadata(unit_id: str, local_path: str, filename: str, uploaded_by: str) -> dict:
+    new_pdf = {
+        "id": str(uuid.uuid4()),
+        "unitId": unit_id,
+        "localPath": local_path,
+        "filename": filename,
+        "uploadedBy": uploaded_by,
+        "uploadedAt": datetime.now().isoformat()
+    }
+    _connect().execute(
+        "INSERT INTO uploaded_pdfs (id, unit_id, local_path, filename, uploaded_by, uploaded_at) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (new_pdf["id"], unit_id, local_path, filename, uploaded_by, new_pdf["uploadedAt"]),
+    )
+    return new_pdf
+
+def get_pdfs_for_unit(unit_id: str) -> list:
+    rows = _connect().execute(
+        "SELECT * FROM uploaded_pdfs WHERE unit_id = ? ORDER BY rowid", (unit_id,)
+    ).fetchall()
+    return [_pdf(r) for r in rows]
+
+def delete_pdf_metadata(pdf_id: str):
+    _connect().execute("DELETE FROM uploaded_pdfs WHERE id = ?", (pdf_id,))
+
+# --- Notes Helpers ---
+def get_generated_notes(unit_id: str) -> dict | None:
+    row = _connect().execute("SELECT data FROM generated_notes WHERE unit_id = ?", (unit_id,)).fetchone()
+    if not row:
+        return None
+    try:
+        return json.loads(row["data"])
+    except ValueError:
+        return None
+
+def save_generated_notes(unit_id: str, notes: dict):
+    data = {
+        "unitId": unit_id,
+        **notes,
+        "generatedAt": datetime.now().isoformat()
+    }
+    _connect().execute(
+        "INSERT OR REPLACE INTO generated_notes (unit_id, data, generated_at) VALUES (?, ?, ?)",
+        (unit_id, json.dumps(data), data["generatedAt"]),
+    )
+
+def delete_generated_notes(unit_id: str):
+    _connect().execute("DELETE FROM generated_notes WHERE unit_id = ?", (unit_id,))
+
+# --- Catalog ---
+def get_catalog_version(include_notes: bool = False) -> tuple:
+    """Opaque value that changes whenever the semester/subject/unit tree (and optionally notes availability) does."""
+    keys = ("catalog_version", "notes_version") if include_notes else ("catalog_version",)
+    rows = _connect().execute(
+        f"SELECT key, value FROM meta WHERE key IN ({','.join('?' * len(keys))}) ORDER BY key", keys
+    ).fetchall()
+    return tuple(int(r["value"]) for r in rows)
+
+def get_units_with_notes() -> set:
+    """IDs of all units that currently have generated notes."""
+    return {r["unit_id"] for r in _connect().execute("SELECT unit_id FROM generated_notes")}
+
+# --- Student Progress ---
+def save_unit_progress(uid: str, unit_id: str, status: str):
+    """Save completion status ('read', 'learned') for a student + unit."""
+    _connect().execute(
+        "INSERT INTO student_progress (uid, unit_id, status, updated_at) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT (uid, unit_id) DO UPDATE SET status = excluded.status, updated_at = excluded.updated_at",
+        (uid, unit_id, status, datetime.now().isoformat()),
+    )
+
+def get_student_progress(uid: str) -> dict:
+    """Get all unit progress for a student as a map: {unit_id: status}."""
+    rows = _connect().execute("SELECT unit_id, status FROM student_progress WHERE uid = ?", (uid,))
+    return {r["unit_id"]: r["status"] for r in rows}
+
+# --- User Helpers ---
+def get_user(uid: str) -> dict | None:
+    row = _connect().execute("SELECT * FROM users WHERE uid = ?", (uid,)).fetchone()
+    return _user(row) if row else None
+
+def create_or_update_user(uid: str, name: str, email: str, role: str = "student"):
+    _connect().execute(
+        "INSERT INTO users (uid, name, email, role) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT (uid) DO UPDATE SET name = excluded.name, email = excluded.email, role = excluded.role",
+        (uid, name, email, role),
+    )
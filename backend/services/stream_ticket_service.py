@@ -0,0 +1,81 @@
+"""
+NoteNexus — Stream Tickets
+EventSource can't send an Authorization header, so SSE streams authenticate
+with a ticket fetched by an authenticated POST instead of putting the ID
+token in the URL, where access logs and proxies would record it. A ticket is
+bound to one user and one stream, expires after STREAM_TICKET_TTL seconds
+and can be redeemed once. Tickets live in a small SQLite file so any worker
+can redeem one another worker issued; only their hashes are stored.
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import secrets
+import threading
+from backend.config import config
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stream_tickets (
+    ticket_hash TEXT PRIMARY KEY,
+    uid         TEXT NOT NULL,
+    scope       TEXT NOT NULL,
+    expires_at  REAL NOT NULL
+);
+"""
+
+_local = threading.local()
+
+
+def _connect() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(config.STREAM_TICKETS_PATH), exist_ok=True)
+        conn = sqlite3.connect(config.STREAM_TICKETS_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.executescript(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def _hash(ticket: str) -> str:
+    return hashlib.sha256(ticket.encode("utf-8")).hexdigest()
+
+
+def issue_ticket(uid: str, scope: str) -> str:
+    """New single-use ticket letting uid open the stream named by scope."""
+    ticket = secrets.token_urlsafe(32)
+    now = time.time()
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM stream_tickets WHERE expires_at < ?", (now,))
+        conn.execute(
+            "INSERT INTO stream_tickets (ticket_hash, uid, scope, expires_at) VALUES (?, ?, ?, ?)",
+            (_hash(ticket), uid, scope, now + config.STREAM_TICKET_TTL),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return ticket
+
+
+def redeem_ticket(ticket: str, scope: str) -> str | None:
+    """uid the ticket was issued to, if it is valid for scope. The ticket is used up either way."""
+    if not ticket:
+        return None
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT uid FROM stream_tickets WHERE ticket_hash = ? AND scope = ? AND expires_at >= ?",
+            (_hash(ticket), scope, time.time()),
+        ).fetchone()
+        conn.execute("DELETE FROM stream_tickets WHERE ticket_hash = ?", (_hash(ticket),))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return row[0] if row else None
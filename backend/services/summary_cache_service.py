@@ -0,0 +1,105 @@
+"""
+NoteNexus — Chunk Summary Cache
+Content-addressed store of chunk summaries. The key is a hash of the chunk
+text, the version of the prompt that produced the summary (summarize_chunk's
+or summarize_chunks_batch's) and the Gemini model, so an unchanged
+chunk is never summarized twice — a new upload or a regenerate only pays for
+chunks that are actually new. Entries live in a small SQLite file shared by
+all workers and are evicted least-recently-used once SUMMARY_CACHE_MAX_BYTES
+is exceeded.
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from backend.config import config
+from backend.services.gemini_service import SUMMARY_PROMPT_VERSION, BATCH_SUMMARY_PROMPT_VERSION
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunk_summaries (
+    key       TEXT PRIMARY KEY,
+    summary   TEXT NOT NULL,
+    size      INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chunk_summaries_last_used ON chunk_summaries(last_used);
+"""
+
+_local = threading.local()
+
+
+def _connect() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(config.SUMMARY_CACHE_PATH), exist_ok=True)
+        conn = sqlite3.connect(config.SUMMARY_CACHE_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.executescript(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def _key(chunk: str, batched: bool = False) -> str:
+    version = f"batch-{BATCH_SUMMARY_PROMPT_VERSION}" if batched else str(SUMMARY_PROMPT_VERSION)
+    h = hashlib.sha256()
+    h.update(f"{version}\0{config.GEMINI_MODEL}\0".encode("utf-8"))
+    h.update(chunk.encode("utf-8"))
+    return h.hexdigest()
+
+
+def get_summary(chunk: str) -> str | None:
+    """Cached summary for this chunk from either current prompt and model, or None."""
+    try:
+        conn = _connect()
+        row = conn.execute(
+            "SELECT key, summary FROM chunk_summaries WHERE key IN (?, ?) LIMIT 1",
+            (_key(chunk), _key(chunk, batched=True)),
+        ).fetchone()
+        if row:
+            conn.execute("UPDATE chunk_summaries SET last_used = ? WHERE key = ?", (time.time(), row[0]))
+            return row[1]
+    except sqlite3.Error as e:
+        print(f"[SummaryCache] Read failed: {e}")
+    return None
+
+
+def put_summary(chunk: str, summary: str, batched: bool = False):
+    """
+    Store a summary (batched=True if summarize_chunks_batch made it), then
+    evict the least recently used entries if over budget.
+    """
+    size = len(summary.encode("utf-8"))
+    if size > config.SUMMARY_CACHE_MAX_BYTES:
+        return
+    try:
+        conn = _connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO chunk_summaries (key, summary, size, last_used) VALUES (?, ?, ?, ?)",
+                (_key(chunk, batched), summary, size, time.time()),
+            )
+            _evict(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    except sqlite3.Error as e:
+        print(f"[SummaryCache] Write failed: {e}")
+
+
+def _evict(conn: sqlite3.Connection):
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM chunk_summaries").fetchone()[0]
+    excess = total - config.SUMMARY_CACHE_MAX_BYTES
+    if excess <= 0:
+        return
+    doomed, freed = [], 0
+    for key, size in conn.execute("SELECT key, size FROM chunk_summaries ORDER BY last_used"):
+        doomed.append((key,))
+        freed += size
+        if freed >= excess:
+            break
+    conn.executemany("DELETE FROM chunk_summaries WHERE key = ?", doomed)
+    print(f"[SummaryCache] Evicted {len(doomed)} summaries ({freed} bytes)")
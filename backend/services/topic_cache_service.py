@@ -0,0 +1,162 @@
+"""
+NoteNexus — Topic Notes Cache
+Stores generated topic notes under a normalized form of the topic, so
+"stack in data structure", "Stacks - DS" and "STACK (data structures)" all
+hit the same entry. With TOPIC_SIMILARITY below 1.0, lookups fall back to
+the most similar cached topic (Jaccard similarity of the normalized word
+sets) at or above it with the same number of words. A variant of the same
+topic can match; a narrower one ("doubly linked list") or a broader one
+("sorting" for "merge sorting algorithms") never gets the other's notes.
+Entries expire after TOPIC_CACHE_TTL seconds; past
+TOPIC_CACHE_MAX_ENTRIES the least recently used are evicted.
+"""
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+from backend.config import config
+
+_STOPWORDS = {
+    "a", "an", "the", "in", "of", "on", "for", "to", "and", "or", "with", "about",
+    "what", "is", "are", "explain", "notes", "note", "topic", "introduction", "intro",
+    "basics", "basic", "concept", "concepts",
+}
+
+# Common BCA abbreviations, expanded before stopword removal and plural folding.
+_ABBREVIATIONS = {
+    "ds": "data structure",
+    "dsa": "data structure algorithm",
+    "dbms": "database management system",
+    "rdbms": "relational database management system",
+    "os": "operating system",
+    "oop": "object oriented programming",
+    "oops": "object oriented programming",
+    "cn": "computer network",
+    "se": "software engineering",
+    "ai": "artificial intelligence",
+    "ml": "machine learning",
+    "daa": "design analysis algorithm",
+    "toc": "theory computation",
+}
+
+# Names whose punctuation matters.
+_SYMBOL_NAMES = {"c++": " cpp ", "c#": " csharp ", ".net": " dotnet "}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS topic_notes (
+    key        TEXT PRIMARY KEY,
+    topic      TEXT NOT NULL,
+    notes      TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used  REAL NOT NULL,
+    hits       INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_topic_notes_last_used ON topic_notes(last_used);
+"""
+
+_local = threading.local()
+
+
+def _connect() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(config.TOPIC_CACHE_PATH), exist_ok=True)
+        conn = sqlite3.connect(config.TOPIC_CACHE_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.executescript(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def _singular(word: str) -> str:
+    if len(word) <= 3 or word.endswith(("ss", "us", "is")):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("sses", "xes", "ches", "shes")):
+        return word[:-2]
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def normalize_topic(topic: str) -> str:
+    """Canonical cache key: sorted, de-duplicated content words of the topic."""
+    text = topic.lower()
+    for symbol, name in _SYMBOL_NAMES.items():
+        text = text.replace(symbol, name)
+    words = []
+    for word in re.findall(r"[a-z0-9]+", text):
+        words.extend(_ABBREVIATIONS.get(word, word).split())
+    return " ".join(sorted({_singular(w) for w in words if w not in _STOPWORDS}))
+
+
+def _similarity(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def get_topic_notes(topic: str) -> dict | None:
+    """Cached notes for this topic (or the most similar cached one), or None."""
+    key = normalize_topic(topic)
+    if not key:
+        return None
+    try:
+        conn = _connect()
+        now = time.time()
+        fresh_after = now - config.TOPIC_CACHE_TTL
+        row = conn.execute(
+            "SELECT key, notes FROM topic_notes WHERE key = ? AND created_at >= ?", (key, fresh_after)
+        ).fetchone()
+
+        if row is None and config.TOPIC_SIMILARITY < 1:
+            words = set(key.split())
+            best, best_score = None, config.TOPIC_SIMILARITY
+            for other, in conn.execute("SELECT key FROM topic_notes WHERE created_at >= ?", (fresh_after,)):
+                other_words = set(other.split())
+                if len(other_words) != len(words):
+                    continue
+                score = _similarity(words, other_words)
+                if score >= best_score:
+                    best, best_score = other, score
+            if best is not None:
+                row = conn.execute("SELECT key, notes FROM topic_notes WHERE key = ?", (best,)).fetchone()
+
+        if row is None:
+            return None
+        conn.execute("UPDATE topic_notes SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, row[0]))
+        print(f"[TopicCache] HIT '{topic}' → '{row[0]}'")
+        return json.loads(row[1])
+    except (sqlite3.Error, ValueError) as e:
+        print(f"[TopicCache] Read failed: {e}")
+        return None
+
+
+def put_topic_notes(topic: str, notes: dict):
+    """Store notes for this topic, expiring old entries and evicting past the size limit."""
+    key = normalize_topic(topic)
+    if not key:
+        return
+    try:
+        conn = _connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO topic_notes (key, topic, notes, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, topic, json.dumps(notes), now, now),
+            )
+            conn.execute("DELETE FROM topic_notes WHERE created_at < ?", (now - config.TOPIC_CACHE_TTL,))
+            conn.execute(
+                "DELETE FROM topic_notes WHERE key NOT IN "
+                "(SELECT key FROM topic_notes ORDER BY last_used DESC LIMIT ?)",
+                (config.TOPIC_CACHE_MAX_ENTRIES,),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    except sqlite3.Error as e:
+        print(f"[TopicCache] Write failed: {e}")
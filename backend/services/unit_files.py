@@ -0,0 +1,36 @@
+"""
+NoteNexus — Unit Files
+Removes the files a deleted unit leaves on disk. Shared by both storage
+backends, which call it once the unit's records are gone.
+"""
+import os
+import glob
+import shutil
+from backend.config import config
+
+
+def remove_unit_files(unit_ids, file_paths):
+    """
+    Delete the units' uploads, notes-side files and the given PDF paths.
+    Runs after the data is committed, so a file another worker already
+    removed is not an error.
+    """
+    for unit_id in unit_ids:
+        shutil.rmtree(os.path.join(config.UPLOADS_DIR, unit_id), ignore_errors=True)
+        # Notes, stale copies, quiz/flashcard pools and progress. Lock files
+        # stay: a generation still running may hold one.
+        for path in glob.glob(os.path.join(config.NOTES_DIR, f"{unit_id}.*")):
+            if not path.endswith(".lock"):
+                remove_if_exists(path)
+    for file_path in file_paths:
+        remove_if_exists(file_path)
+    if unit_ids or file_paths:
+        from backend.services.pdf_service import prune_extracted_text  # loads PyMuPDF; keep it lazy
+        prune_extracted_text()
+
+
+def remove_if_exists(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
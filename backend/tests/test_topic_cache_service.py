@@ -0,0 +1,39 @@
+"""
+Topic cache lookups. Run with: python -m unittest discover backend/tests
+"""
+import os
+import tempfile
+import unittest
+from backend.config import config
+from backend.services import topic_cache_service
+
+
+class FuzzyTopicMatchTest(unittest.TestCase):
+    def setUp(self):
+        self._saved = (config.TOPIC_CACHE_PATH, config.TOPIC_SIMILARITY)
+        self._dir = tempfile.TemporaryDirectory()
+        config.TOPIC_CACHE_PATH = os.path.join(self._dir.name, "topic_cache.db")
+        config.TOPIC_SIMILARITY = 0.3
+        topic_cache_service._local.conn = None
+
+    def tearDown(self):
+        topic_cache_service._local.conn.close()
+        topic_cache_service._local.conn = None
+        config.TOPIC_CACHE_PATH, config.TOPIC_SIMILARITY = self._saved
+        self._dir.cleanup()
+
+    def test_broad_query_does_not_match_narrower_topic(self):
+        topic_cache_service.put_topic_notes("merge sorting algorithms", {"title": "Merge sort"})
+        self.assertIsNone(topic_cache_service.get_topic_notes("sorting"))
+
+    def test_narrow_query_does_not_match_broader_topic(self):
+        topic_cache_service.put_topic_notes("linked list", {"title": "Linked list"})
+        self.assertIsNone(topic_cache_service.get_topic_notes("doubly linked list"))
+
+    def test_variant_of_same_topic_matches(self):
+        topic_cache_service.put_topic_notes("merge sorting algorithms", {"title": "Merge sort"})
+        self.assertEqual(topic_cache_service.get_topic_notes("merge sorting technique"), {"title": "Merge sort"})
+
+
+if __name__ == "__main__":
+    unittest.main()
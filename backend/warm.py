@@ -0,0 +1,275 @@
+"""
+NoteNexus — Cache Warmer
+Pre-generates notes (and optionally quiz/flashcard pools) for every unit that
+has PDFs but nothing cached yet, so exam-time traffic is served from cache.
+Meant to be scheduled overnight, e.g. from cron:
+
+    python -m backend.warm --quiz --flashcards --max-calls 600 --until 06:30
+
+Units are walked semester → subject → unit and warmed WARM_WORKERS at a time.
+Every finished unit is recorded in WARM_STATE_PATH. A rerun skips whatever
+is cached by now, so an interrupted run picks up where it stopped; units
+that failed are not retried until their PDFs change (or --retry-failed).
+A new unit is not started once the call budget is spent, the --until time
+has passed, or Gemini's circuit breaker is open. All Gemini calls run at
+BATCH priority, so students' requests are served first.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from backend.config import config
+from backend.services import local_storage_service as storage
+from backend.services import notes_service
+from backend.services.rate_limit_service import priority, BATCH
+from backend.services.gemini_service import calls_made, circuit_open
+
+# kind -> (served from cache, generate one more variant, pool size)
+_DERIVED = {
+    "quiz": (notes_service.get_cached_quiz, notes_service.generate_unit_quiz, config.QUIZ_VARIANTS),
+    "flashcards": (notes_service.get_cached_flashcards, notes_service.generate_unit_flashcards,
+                   config.FLASHCARD_VARIANTS),
+}
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m backend.warm",
+                                     description="Pre-generate notes for units with PDFs but no cache.")
+    parser.add_argument("--semester", action="append", metavar="ID",
+                        help="only warm this semester (repeatable; default: all)")
+    parser.add_argument("--quiz", action="store_true", help="also fill each unit's quiz pool")
+    parser.add_argument("--flashcards", action="store_true", help="also fill each unit's flashcard pool")
+    parser.add_argument("--workers", type=int, default=config.WARM_WORKERS,
+                        help=f"units warmed in parallel (default {config.WARM_WORKERS})")
+    parser.add_argument("--max-calls", type=int, metavar="N",
+                        help="start no new unit after N Gemini requests; running units finish")
+    parser.add_argument("--until", metavar="HH:MM",
+                        help="start no new unit after this local time (next occurrence)")
+    parser.add_argument("--state", default=config.WARM_STATE_PATH, help="progress file for resuming")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="retry units that failed in an earlier run even if their PDFs are unchanged")
+    parser.add_argument("--dry-run", action="store_true", help="list the units that would be warmed and exit")
+    return parser.parse_args(argv)
+
+
+def _deadline(until: str | None) -> float | None:
+    """time.time() of the next HH:MM, or None."""
+    if not until:
+        return None
+    hour, minute = (int(part) for part in until.split(":"))
+    now = datetime.datetime.now()
+    at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if at <= now:
+        at += datetime.timedelta(days=1)
+    return at.timestamp()
+
+
+# ── Progress file ─────────────────────────────────────────────────────────────
+
+def _load_state(path: str) -> dict:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"units": {}}
+
+
+def _save_state(path: str, state: dict):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+# ── Planning ─────────────────────────────────────────────────────────────────
+
+def _catalog(semester_ids=None):
+    """(unit, "Semester › Subject › Unit n") for every unit, in catalog order."""
+    for semester in storage.get_semesters():
+        if semester_ids and semester["id"] not in semester_ids:
+            continue
+        for subject in storage.get_subjects(semester["id"]):
+            for unit in storage.get_units(subject["id"]):
+                label = (f"{semester.get('name', '?')} › {subject.get('name', '?')} › "
+                         f"Unit {unit.get('unitNumber', '?')}: {unit.get('title', '')}")
+                yield unit, label
+
+
+def _pdf_ids(unit_id: str) -> list[str]:
+    return sorted(pdf["id"] for pdf in storage.get_pdfs_for_unit(unit_id))
+
+
+def _pool_full(kind: str, unit_id: str) -> bool:
+    get_cached, _generate, _pool_size = _DERIVED[kind]
+    cached = get_cached(unit_id)
+    return bool(cached) and not cached.get("refill")
+
+
+def _missing(unit_id: str, kinds: list[str]) -> list[str]:
+    """What still has to be generated for the unit: "notes" and/or derived kinds."""
+    missing = [] if storage.get_generated_notes(unit_id) else ["notes"]
+    for kind in kinds:
+        if "notes" in missing or not _pool_full(kind, unit_id):
+            missing.append(kind)
+    return missing
+
+
+# ── Warming one unit ──────────────────────────────────────────────────────────
+
+def _warm_unit(unit_id: str, missing: list[str]) -> dict:
+    started = time.monotonic()
+    outcome = {"status": "generated", "generated": []}
+    if "notes" in missing:
+        result = notes_service.get_or_generate_notes(unit_id)
+        status = result.get("status")
+        if status == "pending":
+            outcome["status"] = "busy"
+        elif status in ("error", "stale"):
+            outcome.update(status="failed", message=result.get("message", "Notes generation failed."))
+        elif status == "generated":
+            outcome["generated"].append("notes")
+
+    for kind in missing:
+        if kind == "notes" or outcome["status"] != "generated":
+            continue
+        _get_cached, generate, pool_size = _DERIVED[kind]
+        made = 0
+        while made < max(pool_size, 1) and not _pool_full(kind, unit_id):
+            result = generate(unit_id)
+            if result.get("status") != "success" or result.get("stale"):
+                outcome.update(status="failed", message=result.get("message", f"{kind} generation failed."))
+                break
+            made += 1
+        if made:
+            outcome["generated"].append(kind)
+
+    outcome["seconds"] = round(time.monotonic() - started, 1)
+    return outcome
+
+
+# ── Run ───────────────────────────────────────────────────────────────────────
+
+def run(args) -> int:
+    kinds = [kind for kind in _DERIVED if getattr(args, kind)]
+    state = _load_state(args.state)
+    previous = state["units"]
+    state.update(startedAt=time.time(), finishedAt=None)
+
+    counts = {"cached": 0, "no_pdfs": 0, "skipped": 0}
+    todo = []
+    for unit, label in _catalog(args.semester):
+        unit_id = unit["id"]
+        earlier = previous.get(unit_id, {})
+        if (earlier.get("status") == "failed" and not args.retry_failed
+                and earlier.get("pdfs") == _pdf_ids(unit_id)):
+            counts["skipped"] += 1
+            continue
+        missing = _missing(unit_id, kinds)
+        if not missing:
+            counts["cached"] += 1
+            previous[unit_id] = {"label": label, "status": "cached", "at": time.time()}
+        elif "notes" in missing and not storage.get_pdfs_for_unit(unit_id):
+            counts["no_pdfs"] += 1
+        else:
+            todo.append((unit_id, label, missing))
+
+    print(f"[Warm] {len(todo)} unit(s) to warm, {counts['cached']} already cached, "
+          f"{counts['no_pdfs']} without PDFs, {counts['skipped']} failed earlier with the same PDFs")
+    if args.dry_run:
+        for _unit_id, label, missing in todo:
+            print(f"  {label} — {', '.join(missing)}")
+        return 0
+
+    deadline = _deadline(args.until)
+    first_call = calls_made()
+    started = time.monotonic()
+    results, stop_reason = {}, None
+    state_lock = threading.Lock()
+
+    def warm(unit_id, label, missing):
+        print(f"[Warm] → {label} ({', '.join(missing)})")
+        with priority(BATCH):
+            outcome = _warm_unit(unit_id, missing)
+        with state_lock:
+            previous[unit_id] = {"label": label, "at": time.time(), "pdfs": _pdf_ids(unit_id), **outcome}
+            _save_state(args.state, state)
+        print(f"[Warm] ← {label}: {outcome['status']} in {outcome['seconds']}s")
+        return outcome
+
+    pending = list(reversed(todo))
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(args.workers, 1), thread_name_prefix="warm") as pool:
+        try:
+            while pending or running:
+                while pending and len(running) < max(args.workers, 1) and not stop_reason:
+                    if args.max_calls is not None and calls_made() - first_call >= args.max_calls:
+                        stop_reason = f"call budget of {args.max_calls} reached"
+                    elif deadline and time.time() >= deadline:
+                        stop_reason = f"--until {args.until} reached"
+                    elif circuit_open():
+                        stop_reason = "Gemini is failing (circuit breaker open)"
+                    else:
+                        unit_id, label, missing = pending.pop()
+                        running[pool.submit(warm, unit_id, label, missing)] = unit_id
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    unit_id = running.pop(future)
+                    try:
+                        results[unit_id] = future.result()
+                    except Exception as e:
+                        print(f"[Warm] Error warming unit {unit_id}: {e}")
+                        results[unit_id] = {"status": "failed", "message": str(e)}
+                        with state_lock:
+                            previous[unit_id] = {"status": "failed", "message": str(e), "at": time.time(),
+                                                 "pdfs": _pdf_ids(unit_id)}
+                            _save_state(args.state, state)
+        except KeyboardInterrupt:
+            stop_reason = "interrupted"
+            print(f"[Warm] Interrupted — letting {len(running)} running unit(s) finish (Ctrl-C again to abort)")
+            pending.clear()
+
+    state["finishedAt"] = time.time()
+    _save_state(args.state, state)
+    return _report(todo, results, counts, stop_reason, calls_made() - first_call, time.monotonic() - started)
+
+
+def _report(todo, results, counts, stop_reason, calls, seconds) -> int:
+    by_status = {}
+    for outcome in results.values():
+        by_status[outcome["status"]] = by_status.get(outcome["status"], 0) + 1
+    not_started = len(todo) - len(results)
+    minutes, secs = divmod(int(seconds), 60)
+
+    print(f"\n[Warm] Finished in {minutes}m {secs:02d}s using {calls} Gemini request(s)")
+    print(f"  generated          {by_status.get('generated', 0)}")
+    print(f"  failed             {by_status.get('failed', 0)}")
+    print(f"  busy (elsewhere)   {by_status.get('busy', 0)}")
+    print(f"  not started        {not_started}" + (f" ({stop_reason})" if stop_reason and not_started else ""))
+    print(f"  already cached     {counts['cached']}")
+    print(f"  without PDFs       {counts['no_pdfs']}")
+    print(f"  failed earlier     {counts['skipped']}")
+    labels = {unit_id: label for unit_id, label, _missing in todo}
+    failed = [(unit_id, o) for unit_id, o in results.items() if o["status"] == "failed"]
+    if failed:
+        print("  failures:")
+        for unit_id, outcome in failed:
+            print(f"    {labels.get(unit_id, unit_id)}: {outcome.get('message')}")
+    return 1 if failed else 0
+
+
+def main(argv=None) -> int:
+    storage.recover_storage()
+    os.makedirs(config.NOTES_DIR, exist_ok=True)
+    return run(_parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -43,6 +43,24 @@ async function apiCall(method, endpoint, body = null) {
     return data;
 }
 
+/**
+ * Call a generation endpoint. If it answers with a queued job (202 + jobId),
+ * poll /api/jobs/<id> until the job finishes and return the job's result.
+ */
+async function apiJob(method, endpoint, body = null) {
+    const data = await apiCall(method, endpoint, body);
+    if (!data.jobId) return data;
+
+    while (true) {
+        await new Promise(r => setTimeout(r, 2000));
+        const { job } = await apiCall('GET', data.statusUrl || `/api/jobs/${data.jobId}`);
+        if (job.status === 'done' || job.status === 'failed') {
+            if (job.result) return job.result;
+            throw new Error(job.error || 'Generation failed');
+        }
+    }
+}
+
 /**
  * Make an authenticated multipart form upload.
  */